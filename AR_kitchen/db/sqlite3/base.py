@@ -0,0 +1,18 @@
+# AR_kitchen/db/sqlite3/base.py
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Django's SQLite backend, opening transactions with ``settings.SQLITE_TRANSACTION_MODE``.
+
+    A plain ``BEGIN`` is deferred: the write lock is only requested at the
+    first write, and if another connection committed in the meantime SQLite
+    fails at once with "database is locked" instead of waiting out
+    busy_timeout. ``BEGIN IMMEDIATE`` takes the lock up front, so writers
+    queue instead. (Django 5.1 has this built in as OPTIONS['transaction_mode'].)
+    """
+
+    def _start_transaction_under_autocommit(self):
+        mode = getattr(settings, 'SQLITE_TRANSACTION_MODE', 'DEFERRED')
+        self.cursor().execute(f"BEGIN {mode}")
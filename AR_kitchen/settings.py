@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,12 +50,14 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 
 MIDDLEWARE = [
+    'shop.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'shop.cart.CartMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -83,12 +86,77 @@ WSGI_APPLICATION = 'AR_kitchen.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. Production sets DB_ENGINE=postgres plus the POSTGRES_*
+# variables below. A replica (POSTGRES_REPLICA_HOST, or SQLITE_REPLICA_NAME
+# for a local two-file setup) receives catalog reads via shop.routers.
+
+
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+# Seconds a worker keeps its connection open; 0 reconnects on every request
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60 if DB_ENGINE == 'postgres' else 0))
+# Behind pgbouncer in transaction mode: server-side cursors don't survive between transactions
+DB_PGBOUNCER = env_bool('DB_PGBOUNCER')
+
+
+def postgres_database(host, port):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'ar_kitchen'),
+        'USER': os.environ.get('POSTGRES_USER', 'ar_kitchen'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5)),
+            'application_name': 'ar_kitchen',
+        },
     }
-}
+
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': postgres_database(
+            os.environ.get('POSTGRES_HOST', 'localhost'), os.environ.get('POSTGRES_PORT', '5432'),
+        ),
+    }
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database(
+            os.environ['POSTGRES_REPLICA_HOST'],
+            os.environ.get('POSTGRES_REPLICA_PORT', os.environ.get('POSTGRES_PORT', '5432')),
+        )
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'AR_kitchen.db.sqlite3',  # Django's backend + SQLITE_TRANSACTION_MODE
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # A file, as threaded tests (CapacityRaceTests) need: shared-cache
+            # memory fails concurrent writers with "table is locked".
+            # SQLITE_TEST_NAME=:memory: is faster but skips those tests
+            'TEST': {'NAME': os.environ.get('SQLITE_TEST_NAME', BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+    if os.environ.get('SQLITE_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            'ENGINE': 'AR_kitchen.db.sqlite3',  # Django's backend + SQLITE_TRANSACTION_MODE
+            'NAME': os.environ['SQLITE_REPLICA_NAME'],
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        }
+
+if 'replica' in DATABASES:
+    # Tests run against the primary only; the replica alias just points at it
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Alias that catalog reads go to; None keeps everything on 'default'
+CATALOG_READ_ALIAS = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['shop.routers.CatalogReplicaRouter']
 
 
 # Password validation
@@ -155,4 +223,93 @@ EMAIL_HOST_PASSWORD = 'zjau dheo gqxi kfra'  # ← YOUR APP PASSWORD
 DEFAULT_FROM_EMAIL = 'AR Kitchen <al-rafi210038@diit.edu.bd>'
 
 # ADMIN EMAIL (SAME OR DIFFERENT)
-ADMIN_EMAILS = ['al-rafi210038@diit.edu.bd']
\ No newline at end of file
+ADMIN_EMAILS = ['al-rafi210038@diit.edu.bd']
+
+# CACHE
+# Per-process by default; point this at a shared backend (memcached/redis)
+# when running several gunicorn workers so signal invalidation reaches all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ar-kitchen',
+    }
+}
+HOME_CACHE_TIMEOUT = 60 * 60  # seconds; sections are also invalidated on save/delete
+HOME_REVIEW_LIMIT = 12  # reviews in the home carousel (3 slides of 4)
+FLAVOR_MENU_LOCAL_TTL = 60  # seconds each worker keeps its own copy of the flavor menu
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60  # catalog pages/fragments; keys also carry a version bumped on every edit
+
+
+# PRODUCT SEARCH
+# None picks SQLite FTS5 or PostgreSQL full-text search from the database
+# engine; set a dotted path (e.g. 'shop.search.BasicSearchBackend') to override.
+SEARCH_BACKEND = None
+SEARCH_MAX_RESULTS = 200
+
+
+# SHOP LISTING
+# Product count shown above the shop grid: 'estimate' (planner estimate on
+# PostgreSQL, capped count elsewhere), 'exact' (COUNT(*)) or 'none'.
+SHOP_COUNT_MODE = 'estimate'
+
+
+# OUTBOUND EMAIL QUEUE
+# Views queue notifications in shop.OutboundEmail; deliver them with
+# `python manage.py send_queued_mail --loop` running next to gunicorn.
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 60  # seconds, doubled after each failed attempt
+
+
+# CART STORAGE
+# Session (default) writes the django_session row on every cart change.
+# 'shop.cart.CacheCartStorage' keeps carts in CART_CACHE_ALIAS behind a signed
+# id cookie; 'shop.cart.SignedCookieCartStorage' keeps them in the cookie itself.
+CART_STORAGE = 'shop.cart.SessionCartStorage'
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_AGE = 30 * 24 * 60 * 60  # seconds
+CART_CACHE_ALIAS = 'default'
+CART_MAX_QUANTITY = 99  # pieces of one product per cart; larger requests are capped
+
+
+# SQLITE TUNING
+# PRAGMAs run on every new SQLite connection (see shop.signals); {} keeps
+# SQLite's defaults. Ignored on PostgreSQL. WAL is opt-in (SQLITE_WAL=1):
+# it is persistent, rewriting the database file's header and leaving
+# -wal/-shm files next to it, so a checkout's committed db.sqlite3 is left
+# alone unless a deployment serving concurrent shoppers asks for it.
+SQLITE_WAL = env_bool('SQLITE_WAL')
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,  # ms to wait for the write lock before "database is locked"
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # negative means KiB, so about 20 MB per connection
+    'temp_store': 'MEMORY',
+}
+if SQLITE_WAL:
+    SQLITE_PRAGMAS.update({
+        'journal_mode': 'WAL',  # readers stop blocking the writer and vice versa
+        'synchronous': 'NORMAL',  # durable with WAL; fsync only at checkpoints
+    })
+# IMMEDIATE makes transactions take the write lock at BEGIN, so concurrent
+# checkouts wait for busy_timeout instead of failing with "database is locked";
+# it comes with SQLITE_WAL, otherwise Django's deferred BEGIN is kept
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE' if SQLITE_WAL else 'DEFERRED'
+
+
+# PERFORMANCE METRICS
+# Per-view timings (DB, templates, cache, mail) in per-process histograms,
+# served to staff at /metrics/ (JSON, or ?format=prometheus). When off, the
+# middleware removes itself from the stack. SMTP delivery happens in the
+# send_queued_mail worker, so its timings are printed there, not served here.
+PERF_METRICS = True
+PERF_SERVER_TIMING = DEBUG  # Server-Timing response header, visible in browser devtools
+
+
+# PRODUCTION CAPACITY
+# Default cakes per delivery date (orders plus custom requests); dates can
+# be given their own capacity, or closed with 0, in the DeliveryCapacity
+# admin. None means unlimited unless a date sets one. Checkout and the
+# custom cake form reserve against the per-date counter.
+DAILY_CAPACITY = None
+# Days ahead the delivery-dates API looks over; run
+# `manage.py sync_delivery_capacity` daily to keep a counter row for each
+BOOKING_HORIZON_DAYS = 60
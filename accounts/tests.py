@@ -1,3 +1,64 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.models import Category, Order, OrderItem, Product
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('amina', password='pw')
+        self.client.login(username='amina', password='pw')
+        category = Category.objects.create(name='Cakes', slug='cakes')
+        self.products = [
+            Product.objects.create(name=f'Cake {i}', slug=f'cake-{i}', category=category,
+                                   description='', price=Decimal('100.00'), image='products/test.jpg')
+            for i in range(3)
+        ]
+
+    def make_order(self, user=None):
+        order = Order.objects.create(
+            user=user or self.user, name='Amina', phone='017', delivery_method='pickup',
+            delivery_date=date.today() + timedelta(days=1), total=Decimal('0'),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=Decimal('80.00'), quantity=2)
+            for product in self.products
+        ])
+        return order
+
+    def count_profile_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_profile_query_count_is_constant(self):
+        self.make_order()
+        self.client.get(reverse('accounts:profile'))  # warm the flavor menu
+        one_order = self.count_profile_queries()
+        for _ in range(5):
+            self.make_order()
+        self.assertEqual(one_order, self.count_profile_queries())
+
+    def test_reorder_skips_unavailable_and_uses_current_price(self):
+        order = self.make_order()
+        self.products[0].available = False
+        self.products[0].save()
+        self.products[1].price = Decimal('120.00')
+        self.products[1].save()
+
+        response = self.client.post(reverse('accounts:reorder', args=[order.id]), follow=True)
+        self.assertRedirects(response, reverse('shop:cart'))
+        self.assertEqual([item['quantity'] for item in response.context['cart_items']], [2, 2])
+        self.assertEqual(response.context['total'], Decimal('440.00'))
+        self.assertContains(response, 'No longer available: Cake 0')
 
-# Create your tests here.
+    def test_cannot_reorder_someone_elses_order(self):
+        order = self.make_order(user=User.objects.create_user('other'))
+        self.assertEqual(self.client.post(reverse('accounts:reorder', args=[order.id])).status_code, 404)
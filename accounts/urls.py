@@ -11,4 +11,5 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('profile/', views.profile, name='profile'),
+    path('orders/<int:order_id>/reorder/', views.reorder, name='reorder'),
 ]
\ No newline at end of file
@@ -1,10 +1,12 @@
 # accounts/views.py
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from shop.models import Order 
+from shop.cart import Cart
+from shop.models import Order, OrderItem
 from .forms import CustomRegisterForm
 
 def register(request):
@@ -42,5 +44,30 @@ def profile(request):
 
 @login_required
 def profile(request):
-    orders = request.user.orders.all().order_by('-created')[:10]
-    return render(request, 'accounts/profile.html', {'orders': orders})
\ No newline at end of file
+    orders = request.user.orders.order_by('-created').prefetch_related('items__product')[:10]
+    return render(request, 'accounts/profile.html', {'orders': orders})
+
+@login_required
+@require_POST
+def reorder(request, order_id):
+    order = get_object_or_404(Order, id=order_id, user=request.user)
+    # One query: the order's lines with their products; the cart prices them at today's price
+    lines = OrderItem.objects.filter(order=order).select_related('product__category')
+
+    quantities, products, skipped = {}, {}, set()
+    for line in lines:
+        product = line.product
+        if not product.available:
+            skipped.add(product.name)
+            continue
+        products[product.slug] = product
+        quantities[product.slug] = quantities.get(product.slug, 0) + line.quantity
+
+    if quantities:
+        Cart(request).add_many(quantities, products=products)
+        messages.success(request, f"Items from order #{order.id} were added to your cart.")
+    if skipped:
+        messages.warning(request, f"No longer available: {', '.join(sorted(skipped))}.")
+    if not quantities:
+        return redirect('accounts:profile')
+    return redirect('shop:cart')
@@ -1,7 +1,27 @@
 from django.contrib import admin
-from .models import Category, Flavor, Product, Order, Review, FAQ , Feedback, CustomCakeRequest
+from .models import Category, Flavor, Product, Order, Review, FAQ , Feedback, CustomCakeRequest, OutboundEmail, DailySales, DeliveryCapacity
 from django.utils.html import format_html
 from django.utils import timezone
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from .analytics import SCHEDULE_DAYS, TREND_DAYS, production_schedule, revenue_trend
+from .cache import invalidate_home
+from .exports import streaming_export
+from .orders import delete_orders, orders_changed
+from .production import recount_bookings
+from .signals import make_image_derivatives
+
+
+class StreamingExportMixin:
+    """CSV/JSONL export actions that stream the selection instead of building it in memory."""
+
+    @admin.action(description="Export selected as CSV")
+    def export_csv(self, request, queryset):
+        return streaming_export(queryset, 'csv')
+
+    @admin.action(description="Export selected as JSONL")
+    def export_jsonl(self, request, queryset):
+        return streaming_export(queryset, 'jsonl')
 
 
 @admin.register(Category)
@@ -29,25 +49,88 @@ class ProductAdmin(admin.ModelAdmin):
     filter_horizontal = ['flavors']
     fields = ['name', 'slug', 'description', 'price', 'weight', 'image', 'category', 'flavors']
     
+import re
+
 from django.contrib import admin
+from django.db.models import F, OuterRef, Q, Subquery, Sum
 from django.utils.html import format_html
 from .models import Product, Order, OrderItem, Category
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     fields = ['product', 'quantity', 'price']
+    # An id box with a lookup popup: a product <select> per line would load the whole catalog once per row
+    raw_id_fields = ['product']
     readonly_fields = ['price']
 
     def has_add_permission(self, request, obj=None):
         return False 
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
     
+# Digits with the separators people type in phone numbers: +880 1712-345678, (017) 12 345678
+PHONE_TERM = re.compile(r'^\+?[\d\s().-]+$')
+
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'phone', 'delivery_method', 'delivery_date', 'total', 'created']
-    list_filter = ['delivery_method', 'delivery_date', 'created']
-    search_fields = ['name', 'phone', 'id']
+class OrderAdmin(StreamingExportMixin, admin.ModelAdmin):
+    list_display = ['id', 'name', 'phone', 'user', 'delivery_method', 'delivery_date', 'item_count', 'revenue', 'total', 'created']
+    list_filter = ['delivery_method', 'created']
+    list_select_related = ['user']
+    date_hierarchy = 'delivery_date'
+    # Phone-like terms are matched against id/phone in get_search_results; names use LIKE
+    search_fields = ['name']
+    # Skip the unfiltered COUNT(*) over the whole table on every filtered page
+    show_full_result_count = False
     readonly_fields = ['total', 'created']
     inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_jsonl']
+
+    def get_queryset(self, request):
+        # Correlated subqueries rather than JOIN + GROUP BY: they only run for the
+        # rows on the page, and COUNT(*) and the date hierarchy can drop them
+        items = OrderItem.objects.filter(order=OuterRef('pk')).values('order')
+        return super().get_queryset(request).annotate(
+            item_count=Subquery(items.annotate(total=Sum('quantity')).values('total')),
+            revenue=Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().lstrip('#')
+        digits = re.sub(r'\D', '', term)
+        if digits and PHONE_TERM.match(term):
+            # Indexed equality on the primary key or phone instead of CAST(id) LIKE '%..%';
+            # phones are stored as typed, so try the term as given, bare digits and +digits
+            lookup = Q(phone__in={term, digits, '+' + digits})
+            if term.isdigit() and len(term) <= 9:
+                lookup |= Q(pk=int(term))
+            matches = queryset.filter(lookup)
+            if matches.exists():
+                return matches, False
+            # A partial number: prefix match, only once the exact lookup found nothing
+            return queryset.filter(Q(phone__startswith=digits) | Q(phone__startswith='+' + digits)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.display(description='Items', ordering='item_count')
+    def item_count(self, obj):
+        return obj.item_count or 0
+
+    @admin.display(description='Revenue', ordering='revenue')
+    def revenue(self, obj):
+        return obj.revenue or 0
+
+    # Edits and deletes go through orders_changed, which place_order's incremental updates don't cover
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # A moved order changes both its old and its new date
+        orders_changed({form.initial.get('delivery_date'), form.instance.delivery_date})
+
+    def delete_model(self, request, obj):
+        delete_orders(Order.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_orders(queryset)
   
 
          
@@ -56,6 +139,20 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product_name_with_image', 'quantity', 'price']
     list_select_related = ['product', 'order']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        previous = form.initial.get('order')
+        orders_changed({obj.order.delivery_date, *Order.objects.filter(pk=previous).values_list('delivery_date', flat=True)})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        orders_changed({obj.order.delivery_date})
+
+    def delete_queryset(self, request, queryset):
+        days = set(queryset.values_list('order__delivery_date', flat=True).order_by().distinct())
+        super().delete_queryset(request, queryset)
+        orders_changed(days)
+
     def product_name_with_image(self, obj):
         if obj.product.image:
             return format_html(
@@ -101,11 +198,15 @@ class FeedbackAdmin(admin.ModelAdmin):
 
     def approve_feedback(self, request, queryset):
         queryset.update(is_approved=True)
+        # update() skips post_save: refresh the home page and resize the photos here
+        invalidate_home('feedbacks')
+        for feedback in queryset.exclude(photo=''):
+            make_image_derivatives(Feedback, feedback)
     approve_feedback.short_description = "Approve selected feedback"        
     
 # shop/admin.py
 @admin.register(CustomCakeRequest)
-class CustomCakeRequestAdmin(admin.ModelAdmin):
+class CustomCakeRequestAdmin(StreamingExportMixin, admin.ModelAdmin):
     list_display = ['id', 'name', 'phone', 'flavor', 'weight', 'delivery_date','created', 'replied']
     list_filter = ['weight', 'created', 'replied']
     search_fields = ['name', 'phone', 'email']
@@ -114,4 +215,77 @@ class CustomCakeRequestAdmin(admin.ModelAdmin):
     def mark_as_replied(self, request, queryset):
         queryset.update(replied=True)
     mark_as_replied.short_description = "Mark as replied"
-    actions = [mark_as_replied]    
\ No newline at end of file
+    actions = [mark_as_replied, 'export_csv', 'export_jsonl']
+
+    # Requests take a delivery slot each; give it back when one is moved or removed
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            # Added by staff, not through the form's reservation
+            recount_bookings({obj.delivery_date})
+        elif 'delivery_date' in form.changed_data:
+            recount_bookings({form.initial['delivery_date'], obj.delivery_date})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recount_bookings({obj.delivery_date})
+
+    def delete_queryset(self, request, queryset):
+        days = set(queryset.values_list('delivery_date', flat=True).order_by().distinct())
+        super().delete_queryset(request, queryset)
+        recount_bookings(days)
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['created', 'sent_at', 'last_error']
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+    retry_now.short_description = "Retry selected emails now"
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """Production schedule and revenue trend, read from the rollup table only.
+
+    Every query is bounded by a fixed date window, so the page costs the
+    same however many orders have been placed.
+    """
+    change_list_template = 'admin/shop/dailysales/dashboard.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Sales & production',
+            'schedule': production_schedule(),
+            'schedule_days': SCHEDULE_DAYS,
+            'trend': revenue_trend(),
+            'trend_days': TREND_DAYS,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, self.change_list_template, context)
+
+
+@admin.register(DeliveryCapacity)
+class DeliveryCapacityAdmin(admin.ModelAdmin):
+    list_display = ['date', 'capacity', 'booked']
+    list_editable = ['capacity']
+    date_hierarchy = 'date'
+    # Moved by reservations and admin edits/deletes; sync_delivery_capacity --recount repairs the rest
+    readonly_fields = ['booked']
@@ -0,0 +1,141 @@
+# shop/analytics.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import DailySales, OrderItem
+
+SCHEDULE_DAYS = 14
+TREND_DAYS = 30
+
+
+# === INCREMENTAL UPDATES ===
+def record_order(order, items):
+    """Add a just-placed order's lines to the ``DailySales`` rollup.
+
+    One ``INSERT ... ON CONFLICT DO UPDATE`` for all lines, so concurrent
+    checkouts add to the same row instead of racing to create it. Call it
+    inside the transaction that saves the order.
+    """
+    if not items:
+        return
+    quote = connection.ops.quote_name
+    table = quote(DailySales._meta.db_table)
+    day = connection.ops.adapt_datefield_value(order.delivery_date)
+    params = []
+    for item in items:
+        params += [day, item.product_id, order.delivery_method, item.quantity,
+                   connection.ops.adapt_decimalfield_value(item.price * item.quantity, 12, 2)]
+    counters = ['quantity', 'revenue', 'order_count']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({quote('date')}, {quote('product_id')}, {quote('delivery_method')}, "
+            f"{', '.join(map(quote, counters))}) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s, 1)'] * len(items))} "
+            f"ON CONFLICT ({quote('date')}, {quote('product_id')}, {quote('delivery_method')}) DO UPDATE SET "
+            + ', '.join(f'{quote(name)} = {table}.{quote(name)} + excluded.{quote(name)}' for name in counters),
+            params,
+        )
+
+
+# === REBUILD ===
+def rebuild(start=None, end=None, days=31):
+    """Recompute the rollup from ``OrderItem`` for ``start``..``end`` (inclusive).
+
+    History is walked ``days`` delivery dates at a time: each window is one
+    grouped query and one bulk insert in its own transaction, so memory is
+    bounded by a window's rows, not by the size of the order history.
+    Yields ``(window_start, rows_written)`` as it goes.
+    """
+    items = OrderItem.objects.all()
+    full = start is None and end is None
+    if start is None or end is None:
+        bounds = items.order_by('order__delivery_date').values_list('order__delivery_date', flat=True)
+        if start is None:
+            start = bounds.first()
+        if end is None:
+            end = bounds.reverse().first()
+    if start is None or end is None:
+        if full:
+            DailySales.objects.all().delete()
+        return
+    if full:
+        # Rows for dates whose orders have all been deleted
+        DailySales.objects.exclude(date__range=(start, end)).delete()
+
+    window = start
+    while window <= end:
+        window_end = min(window + timedelta(days=days - 1), end)
+        rows = (
+            items.filter(order__delivery_date__range=(window, window_end))
+            .values('order__delivery_date', 'product_id', 'order__delivery_method')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum(F('price') * F('quantity')),
+                orders=Count('order', distinct=True),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            DailySales.objects.filter(date__range=(window, window_end)).delete()
+            written = DailySales.objects.bulk_create([
+                DailySales(
+                    date=row['order__delivery_date'], product_id=row['product_id'],
+                    delivery_method=row['order__delivery_method'], quantity=row['total_quantity'],
+                    revenue=row['total_revenue'], order_count=row['orders'],
+                )
+                for row in rows.iterator(chunk_size=2000)
+            ], batch_size=1000)
+        yield window, len(written)
+        window = window_end + timedelta(days=1)
+
+
+def refresh_dates(days):
+    """Rebuild the rollup for just ``days``, after their orders were edited or deleted."""
+    for day in sorted(days):
+        for _ in rebuild(day, day):
+            pass
+
+
+# === DASHBOARD ===
+def production_schedule(start=None, days=SCHEDULE_DAYS):
+    """``[(date, [row, ...]), ...]`` of cakes to bake per product, pickup and delivery split."""
+    start = start or timezone.localdate()
+    rows = (
+        DailySales.objects.filter(date__range=(start, start + timedelta(days=days - 1)))
+        .values('date', 'product__name', 'delivery_method')
+        .annotate(quantity=Sum('quantity'))
+        .order_by('date', 'product__name')
+    )
+    schedule = {}
+    for row in rows:
+        day = schedule.setdefault(row['date'], {})
+        line = day.setdefault(row['product__name'], {'product': row['product__name'], 'pickup': 0, 'delivery': 0})
+        line[row['delivery_method']] = row['quantity']
+    return [
+        (day, [{**line, 'total': line['pickup'] + line['delivery']} for line in lines.values()])
+        for day, lines in schedule.items()
+    ]
+
+
+def revenue_trend(end=None, days=TREND_DAYS):
+    """Revenue and cakes per delivery date for the ``days`` up to ``end``, zero-filled."""
+    end = end or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    totals = {
+        row['date']: row
+        for row in DailySales.objects.filter(date__range=(start, end))
+        .values('date').annotate(revenue=Sum('revenue'), quantity=Sum('quantity')).order_by()
+    }
+    trend = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = totals.get(day, {})
+        trend.append({'date': day, 'revenue': row.get('revenue') or Decimal('0'), 'quantity': row.get('quantity') or 0})
+    peak = max((row['revenue'] for row in trend), default=0) or 1
+    for row in trend:
+        row['percent'] = round(row['revenue'] * 100 / peak)
+    return trend
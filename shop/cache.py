@@ -0,0 +1,232 @@
+# shop/cache.py
+import hashlib
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .cart import Cart
+from .metrics import note_cache
+from .models import FAQ, Category, Feedback, Flavor, Product, Review
+
+HOME_CACHE_TIMEOUT = getattr(settings, 'HOME_CACHE_TIMEOUT', 60 * 60)
+HOME_REVIEW_LIMIT = getattr(settings, 'HOME_REVIEW_LIMIT', 12)
+FLAVOR_MENU_TIMEOUT = getattr(settings, 'FLAVOR_MENU_TIMEOUT', 24 * 60 * 60)
+FLAVOR_MENU_LOCAL_TTL = getattr(settings, 'FLAVOR_MENU_LOCAL_TTL', 60)
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def _featured():
+    return list(Product.objects.available().filter(featured=True).for_listing('description')[:6])
+
+
+def _categories():
+    return list(Category.objects.annotate(product_count=Count('products'))[:6])
+
+
+def _reviews():
+    return list(Review.objects.order_by('-created')[:HOME_REVIEW_LIMIT])
+
+
+def _faqs():
+    return list(FAQ.objects.filter(is_answered=True))
+
+
+def _feedbacks():
+    return list(Feedback.objects.filter(is_approved=True)[:6])
+
+
+HOME_SECTIONS = {
+    'featured': _featured,
+    'categories': _categories,
+    'reviews': _reviews,
+    'faqs': _faqs,
+    'feedbacks': _feedbacks,
+}
+
+
+def _home_key(section):
+    return f'home:{section}'
+
+
+def get_home_sections():
+    """Return every home page section, loading only the ones missing from cache."""
+    keys = {section: _home_key(section) for section in HOME_SECTIONS}
+    cached = cache.get_many(keys.values())
+    sections, missing = {}, {}
+    for section, key in keys.items():
+        if key in cached:
+            sections[section] = cached[key]
+        else:
+            sections[section] = missing[key] = HOME_SECTIONS[section]()
+    record_cache_stat('home', hits=len(cached), misses=len(missing))
+    if missing:
+        cache.set_many(missing, HOME_CACHE_TIMEOUT)
+    return sections
+
+
+def invalidate_home(*sections):
+    cache.delete_many([_home_key(section) for section in sections])
+
+
+# === FLAVOR MENU (global_context) ===
+FlavorItem = namedtuple('FlavorItem', ['id', 'name'])
+FLAVOR_MENU_KEY = 'flavors:menu'
+
+# (expires_at, menu) for this process; saves even the shared cache round trip
+_local_flavor_menu = None
+
+
+def get_flavor_menu():
+    """Flavor (id, name) tuples, memoized per process and in the shared cache.
+
+    The process copy lives for ``FLAVOR_MENU_LOCAL_TTL`` seconds so other
+    workers pick up changes shortly after the shared key is invalidated.
+    """
+    global _local_flavor_menu
+    now = time.monotonic()
+    if _local_flavor_menu is not None and _local_flavor_menu[0] > now:
+        return _local_flavor_menu[1]
+
+    menu = cache.get(FLAVOR_MENU_KEY)
+    if menu is None:
+        menu = tuple(FlavorItem(*row) for row in Flavor.objects.order_by('id').values_list('id', 'name'))
+        cache.set(FLAVOR_MENU_KEY, menu, FLAVOR_MENU_TIMEOUT)
+    _local_flavor_menu = (now + FLAVOR_MENU_LOCAL_TTL, menu)
+    return menu
+
+
+def invalidate_flavor_menu():
+    global _local_flavor_menu
+    _local_flavor_menu = None
+    cache.delete(FLAVOR_MENU_KEY)
+
+
+# === HIT/MISS COUNTERS ===
+# Kept in the shared cache so every worker adds to the same totals
+CACHE_STATS = ['home', 'page', 'shop', 'category', 'offers', 'product']
+
+
+def _incr(key, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def record_cache_stat(name, hits=0, misses=0):
+    note_cache(hits, misses)
+    _incr(f'stats:{name}:hits', hits)
+    _incr(f'stats:{name}:misses', misses)
+
+
+def get_cache_stats():
+    keys = [f'stats:{name}:{kind}' for name in CACHE_STATS for kind in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    stats = {}
+    for name in CACHE_STATS:
+        hits = values.get(f'stats:{name}:hits', 0)
+        misses = values.get(f'stats:{name}:misses', 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+# === CATALOG VERSION ===
+# Bumped whenever a Product, Category or Flavor changes; every catalog cache
+# key embeds it, so stale listings simply stop being read.
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so an evicted counter never reuses old keys
+        version = int(time.time())
+        cache.add(CATALOG_VERSION_KEY, version, None)
+        version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def _catalog_key(name, key):
+    digest = hashlib.md5(str(key).encode()).hexdigest()
+    return f'catalog:{get_catalog_version()}:{name}:{digest}'
+
+
+def catalog_cached(name, key, builder):
+    """Return ``builder()`` cached under the current catalog version."""
+    full_key = _catalog_key(name, key)
+    value = cache.get(full_key)
+    if value is None:
+        record_cache_stat(name, misses=1)
+        value = builder()
+        cache.set(full_key, value, CATALOG_CACHE_TIMEOUT)
+    else:
+        record_cache_stat(name, hits=1)
+    return value
+
+
+def _page_variant(request):
+    """Part of the page key for what ``base.html`` renders per visitor, or None if uncacheable.
+
+    Logged-in users and pending messages always get a fresh render; guests
+    only differ by the cart badge, so they share one copy per cart size.
+    """
+    if request.method not in ('GET', 'HEAD') or 'messages' in request.COOKIES:
+        return None
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        if request.user.is_authenticated or request.session.get('_messages'):
+            return None
+    return f'cart={Cart(request).line_count}'
+
+
+def cache_page_for_guests(view):
+    """Serve whole rendered pages from cache, keyed by URL, catalog version and cart variant.
+
+    Responses that set cookies or embed a CSRF token are never stored.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        variant = _page_variant(request)
+        if variant is None:
+            return view(request, *args, **kwargs)
+
+        key = _catalog_key('page', f'{variant}:{request.get_full_path()}')
+        cached = cache.get(key)
+        if cached is not None:
+            record_cache_stat('page', hits=1)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        record_cache_stat('page', misses=1)
+        response = view(request, *args, **kwargs)
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        ):
+            cache.set(key, (response.content, response['Content-Type']), CATALOG_CACHE_TIMEOUT)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapper
@@ -0,0 +1,291 @@
+# shop/cart.py
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+CART_COOKIE_NAME = getattr(settings, 'CART_COOKIE_NAME', 'cart')
+CART_COOKIE_AGE = getattr(settings, 'CART_COOKIE_AGE', 30 * 24 * 60 * 60)
+CART_CACHE_ALIAS = getattr(settings, 'CART_CACHE_ALIAS', 'default')
+CART_MAX_QUANTITY = getattr(settings, 'CART_MAX_QUANTITY', 99)
+
+
+def clean_cart_data(data):
+    """Only ``slug: quantity`` pairs with a quantity in 1..CART_MAX_QUANTITY; anything else is dropped."""
+    if not isinstance(data, dict):
+        return {}
+    return {
+        slug: quantity for slug, quantity in data.items()
+        if isinstance(slug, str) and type(quantity) is int and 0 < quantity <= CART_MAX_QUANTITY
+    }
+
+
+# === STORAGE BACKENDS ===
+class BaseCartStorage:
+    """Where the ``{slug: quantity}`` dict lives between requests.
+
+    The dict is kept on the request after the first read, so every ``Cart``
+    built during one request sees the same (possibly just modified) data.
+    """
+
+    def load(self, request):
+        if not hasattr(request, '_cart_data'):
+            # Carts saved before quantities were bounded, or edited client-side, are cleaned on read
+            request._cart_data = clean_cart_data(self.read(request))
+        return dict(request._cart_data)
+
+    def save(self, request, data):
+        request._cart_data = dict(data)
+        request._cart_modified = True
+        self.write(request, request._cart_data)
+
+    def read(self, request):
+        raise NotImplementedError
+
+    def write(self, request, data):
+        raise NotImplementedError
+
+    def process_response(self, request, response):
+        """Called by ``CartMiddleware`` to attach any cookie the backend needs."""
+        return response
+
+
+class SessionCartStorage(BaseCartStorage):
+    """The original behaviour: the cart is a key in ``request.session``."""
+
+    SESSION_KEY = 'cart'
+
+    def read(self, request):
+        return dict(request.session.get(self.SESSION_KEY, {}))
+
+    def write(self, request, data):
+        request.session[self.SESSION_KEY] = data
+        request.session.modified = True
+
+
+class CacheCartStorage(BaseCartStorage):
+    """Cart held in the cache under a random id carried in a signed cookie.
+
+    Writes never touch the database; a cart is lost if the cache evicts it.
+    """
+
+    SALT = 'shop.cart.id'
+
+    def _cart_id(self, request):
+        return request.get_signed_cookie(CART_COOKIE_NAME, default=None, salt=self.SALT)
+
+    def _key(self, cart_id):
+        return f'cart:{cart_id}'
+
+    def read(self, request):
+        cart_id = self._cart_id(request)
+        if not cart_id:
+            return {}
+        return caches[CART_CACHE_ALIAS].get(self._key(cart_id), {})
+
+    def write(self, request, data):
+        cart_id = self._cart_id(request) or getattr(request, '_cart_id', None)
+        if not cart_id:
+            cart_id = request._cart_id = uuid.uuid4().hex
+        caches[CART_CACHE_ALIAS].set(self._key(cart_id), data, CART_COOKIE_AGE)
+
+    def process_response(self, request, response):
+        cart_id = getattr(request, '_cart_id', None)
+        if cart_id:
+            response.set_signed_cookie(
+                CART_COOKIE_NAME, cart_id, salt=self.SALT, max_age=CART_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class SignedCookieCartStorage(BaseCartStorage):
+    """Cart stored client-side in a signed cookie; no server-side state at all.
+
+    Carts are small (a few slugs), well under the 4 KB cookie limit.
+    """
+
+    SALT = 'shop.cart'
+
+    def read(self, request):
+        value = request.COOKIES.get(CART_COOKIE_NAME)
+        if not value:
+            return {}
+        try:
+            data = signing.loads(value, salt=self.SALT, max_age=CART_COOKIE_AGE)
+        except signing.BadSignature:
+            return {}
+        return data
+
+    def write(self, request, data):
+        pass
+
+    def process_response(self, request, response):
+        if not getattr(request, '_cart_modified', False):
+            return response
+        if request._cart_data:
+            response.set_cookie(
+                CART_COOKIE_NAME, signing.dumps(request._cart_data, salt=self.SALT, compress=True),
+                max_age=CART_COOKIE_AGE, secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True, samesite='Lax',
+            )
+        else:
+            response.delete_cookie(CART_COOKIE_NAME, samesite='Lax')
+        return response
+
+
+def get_cart_storage():
+    """Backend from ``settings.CART_STORAGE`` (session by default)."""
+    return import_string(getattr(settings, 'CART_STORAGE', 'shop.cart.SessionCartStorage'))()
+
+
+class CartMiddleware:
+    """Lets cookie-based cart storages set their cookie on the way out."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return get_cart_storage().process_response(request, response)
+
+
+class Cart:
+    """Cart ({slug: quantity}) resolved against the catalog in one query."""
+
+    def __init__(self, request):
+        self.request = request
+        self.storage = get_cart_storage()
+        self.data = self.storage.load(request)
+        self.pruned = []
+        self._items = None
+
+    def __bool__(self):
+        return bool(self.data)
+
+    @property
+    def item_count(self):
+        # Total number of pieces: API responses and the delivery capacity check
+        return sum(self.data.values())
+
+    @property
+    def line_count(self):
+        # Distinct products, shown in the header badge
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    # === MUTATIONS ===
+    def add(self, slug, quantity=1):
+        """Add ``quantity`` pieces, capped at ``CART_MAX_QUANTITY`` per product; below 1 is a ``ValueError``."""
+        if quantity < 1:
+            raise ValueError(f"quantity must be at least 1, got {quantity}")
+        self.data[slug] = min(self.data.get(slug, 0) + quantity, CART_MAX_QUANTITY)
+        self.save()
+
+    def set(self, slug, quantity):
+        """Set the quantity, capped at ``CART_MAX_QUANTITY``; 0 or less removes the product."""
+        if quantity > 0:
+            self.data[slug] = min(quantity, CART_MAX_QUANTITY)
+        else:
+            self.data.pop(slug, None)
+        self.save()
+
+    def add_many(self, quantities, products=None):
+        """Add ``{slug: quantity}`` in one write; returns the slugs that are not on sale.
+
+        The requested and already-carted products are fetched together, so
+        the cart's ``items`` are ready afterwards without another query.
+        ``products`` ({slug: Product}) may supply available products the
+        caller already loaded; only the rest are fetched.
+        """
+        by_slug = dict(products or {})
+        missing = (set(self.data) | set(quantities)) - set(by_slug)
+        if missing:
+            by_slug.update(self._fetch(missing))
+        unavailable = [slug for slug in quantities if slug not in by_slug]
+        for slug, quantity in quantities.items():
+            if slug in by_slug:
+                self.data[slug] = min(self.data.get(slug, 0) + quantity, CART_MAX_QUANTITY)
+        self.save()
+        self._items = self._build(by_slug)
+        return unavailable
+
+    def remove(self, slug):
+        self.data.pop(slug, None)
+        self.save()
+
+    def clear(self):
+        self.data = {}
+        self.save()
+
+    def save(self):
+        self.storage.save(self.request, self.data)
+        self._items = None
+
+    # === LOOKUPS ===
+    @property
+    def items(self):
+        """Line items as dicts of product/quantity/subtotal, in cart order.
+
+        Products that were deleted or marked unavailable are dropped from
+        the cart and their slugs collected in ``self.pruned``.
+        """
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    def _fetch(self, slugs):
+        products = Product.objects.filter(slug__in=slugs, available=True).select_related('category')
+        return {product.slug: product for product in products}
+
+    def _load(self):
+        if not self.data:
+            return []
+        return self._build(self._fetch(self.data.keys()))
+
+    def _build(self, by_slug):
+        self.pruned = [slug for slug in self.data if slug not in by_slug]
+        if self.pruned:
+            for slug in self.pruned:
+                del self.data[slug]
+            self.storage.save(self.request, self.data)
+
+        items = []
+        for slug, quantity in self.data.items():
+            product = by_slug[slug]
+            items.append({
+                'product': product,
+                'quantity': quantity,
+                'subtotal': product.price * quantity,
+            })
+        return items
+
+    @property
+    def total(self):
+        return sum((item['subtotal'] for item in self.items), Decimal('0'))
+
+    def summary(self):
+        """JSON-ready snapshot of the cart for API responses."""
+        return {
+            'count': self.item_count,
+            'lines': self.line_count,
+            'total': str(self.total),
+            'items': [
+                {
+                    'slug': item['product'].slug,
+                    'name': item['product'].name,
+                    'url': item['product'].get_absolute_url(),
+                    'price': str(item['product'].price),
+                    'quantity': item['quantity'],
+                    'subtotal': str(item['subtotal']),
+                }
+                for item in self.items
+            ],
+        }
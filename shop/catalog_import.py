@@ -0,0 +1,381 @@
+# shop/catalog_import.py
+import csv
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_slug
+from django.db import transaction
+
+from .cache import bump_catalog_version, invalidate_flavor_menu, invalidate_home
+from .images import IMAGE_ERRORS, generate_derivatives
+from .models import Category, Flavor, Product
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+# Columns copied onto Product as they are; category and flavors are resolved separately
+PRODUCT_FIELDS = ['name', 'description', 'price', 'weight', 'featured', 'available', 'image']
+PRODUCT_DEFAULTS = {'description': '', 'weight': '', 'featured': False, 'available': True, 'image': ''}
+REQUIRED_FOR_NEW = ['name', 'price', 'category']
+TRUE, FALSE = {'1', 'true', 'yes', 'y', 'on'}, {'0', 'false', 'no', 'n', 'off'}
+FLAVOR_SEPARATOR = '|'
+
+
+class CatalogImportError(Exception):
+    """Raised with every problem found in the input; nothing has been written."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(errors))
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    categories: int = 0
+    flavors: int = 0
+    images: int = 0
+    changes: list = field(default_factory=list)
+
+
+# === READING ===
+def read_rows(path):
+    """``[(line, {column: value})]`` from a CSV file or a JSON list (or ``{"products": [...]}``)."""
+    if str(path).lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('products', [])
+        if not isinstance(data, list):
+            raise CatalogImportError(["JSON input must be a list of products or {\"products\": [...]}"])
+        return list(enumerate(data, 1))
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        try:
+            # Line 1 is the header
+            return list(enumerate(reader, 2))
+        except csv.Error as e:
+            raise CatalogImportError([f"line {reader.line_num}: malformed CSV: {e}"])
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE:
+        return True
+    if text in FALSE:
+        return False
+    raise ValueError(f"not a yes/no value: {value!r}")
+
+
+def _check(model, name, value, label=None):
+    """Run ``model.name``'s validators (max_length, max_digits, slug...) on a cleaned value."""
+    try:
+        model._meta.get_field(name).run_validators(value)
+    except ValidationError as e:
+        raise ValueError(f"{label or name}: {' '.join(e.messages)}")
+
+
+def _same_content(path, storage, name):
+    """Whether the local file at ``path`` matches ``name`` in ``storage``, by size then SHA-256."""
+    if os.path.getsize(path) != storage.size(name):
+        return False
+    digests = []
+    with open(path, 'rb') as local, storage.open(name) as stored:
+        for f in (local, stored):
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+            digests.append(digest.digest())
+    return digests[0] == digests[1]
+
+
+def parse_row(raw):
+    """Clean one input record; only the columns it actually has are returned.
+
+    Empty values count as missing, so a blank CSV cell leaves the existing
+    value alone (and new products get the model default).
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object")
+    raw = {key.strip(): value for key, value in raw.items() if key and value is not None and value != ''}
+    row = {}
+    row['slug'] = str(raw.get('slug', '')).strip()
+    try:
+        validate_slug(row['slug'])
+    except ValidationError:
+        raise ValueError(f"invalid slug {row['slug']!r}")
+    _check(Product, 'slug', row['slug'])
+    for name in ['name', 'description', 'weight', 'image']:
+        if name in raw:
+            row[name] = str(raw[name]).strip()
+            if name != 'image':  # checked once its stored name is known
+                _check(Product, name, row[name])
+    if 'price' in raw:
+        try:
+            price = Decimal(str(raw['price']).strip())
+            if not price.is_finite():
+                raise ValueError(f"invalid price {raw['price']!r}")
+            row['price'] = price.quantize(Decimal('0.01'))
+        except ArithmeticError:  # decimal.InvalidOperation, also for exponents too large to quantize
+            raise ValueError(f"invalid price {raw['price']!r}")
+        if row['price'] < 0:
+            raise ValueError("price cannot be negative")
+        _check(Product, 'price', row['price'])
+    for name in ['featured', 'available']:
+        if name in raw:
+            row[name] = _boolean(raw[name])
+    if raw.get('category'):
+        row['category'] = str(raw['category']).strip()
+        _check(Category, 'slug', row['category'], 'category')
+        if raw.get('category_name'):
+            row['category_name'] = str(raw['category_name']).strip()
+            _check(Category, 'name', row['category_name'], 'category_name')
+    if 'flavors' in raw:
+        flavors = raw['flavors']
+        if isinstance(flavors, str):
+            flavors = flavors.split(FLAVOR_SEPARATOR)
+        row['flavors'] = sorted({str(flavor).strip() for flavor in flavors if str(flavor).strip()})
+        for flavor in row['flavors']:
+            _check(Flavor, 'name', flavor, 'flavor')
+    return row
+
+
+def _category_upserts(rows):
+    """``(existing, upserts)``: ``{slug: name}`` already in the database, and the ``{slug: name}`` to write.
+
+    A category is written when it is new, or when the file names it
+    (``category_name``) differently from the database; new ones without a
+    name get one made from the slug.
+    """
+    wanted, named = {}, set()
+    for row in rows:
+        if 'category' in row:
+            name = row.get('category_name') or wanted.get(row['category'])
+            wanted[row['category']] = name or row['category'].replace('-', ' ').title()
+            if row.get('category_name'):
+                named.add(row['category'])
+    existing = dict(Category.objects.filter(slug__in=wanted).values_list('slug', 'name'))
+    upserts = {
+        slug: name for slug, name in wanted.items()
+        if slug not in existing or (slug in named and existing[slug] != name)
+    }
+    return existing, upserts
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# === IMPORT ===
+class CatalogImporter:
+    """Upsert categories, flavors and products (by slug) from parsed rows in batches.
+
+    Each batch of products is one transaction: a read of the existing rows,
+    one ``bulk_create(update_conflicts=True)`` for new and changed products,
+    and a bulk rewrite of the flavor links that changed. Signals do not run,
+    so the search index and catalog caches are refreshed once at the end.
+    """
+
+    def __init__(self, images_dir=None, batch_size=2000, dry_run=False, storage=default_storage):
+        self.images_dir = images_dir
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.storage = storage
+        self.result = ImportResult()
+        self.copied = []
+
+    def run(self, records):
+        rows = self.validate(records)
+        categories = self.import_categories(rows)
+        flavors = self.import_flavors(rows)
+        for batch in _chunks(rows, self.batch_size):
+            with transaction.atomic():
+                self.import_products(batch, categories, flavors)
+        if not self.dry_run and (self.result.created or self.result.updated or self.result.categories):
+            self.refresh()
+        return self.result
+
+    def validate(self, records):
+        """Parsed rows, or ``CatalogImportError`` with every problem that would stop a write.
+
+        Lengths, numbers and unique names are all checked here, so a dry run
+        that passes means the real run will too.
+        """
+        rows, errors, seen, category_lines = [], [], {}, {}
+        for line, raw in records:
+            try:
+                row = parse_row(raw)
+                if row.get('image'):
+                    _check(Product, 'image', self.image_name(row['image']), 'image')
+            except ValueError as e:
+                errors.append(f"line {line}: {e}")
+                continue
+            if row['slug'] in seen:
+                errors.append(f"line {line}: slug {row['slug']!r} already used on line {seen[row['slug']]}")
+                continue
+            if self.images_dir and row.get('image') and not os.path.isfile(os.path.join(self.images_dir, row['image'])):
+                errors.append(f"line {line}: image {row['image']!r} not found in {self.images_dir}")
+            seen[row['slug']] = line
+            if 'category' in row:
+                category_lines.setdefault(row['category'], line)
+            rows.append(row)
+
+        # Category names are unique: against each other and against categories left as they are
+        existing, upserts = _category_upserts(rows)
+        owners = {name: slug for slug, name in existing.items() if slug not in upserts}
+        taken = dict(Category.objects.filter(name__in=upserts.values()).exclude(slug__in=upserts)
+                     .values_list('name', 'slug'))
+        for slug, name in upserts.items():
+            other = owners.get(name) or taken.get(name)
+            if other and other != slug:
+                errors.append(f"line {category_lines[slug]}: category {slug!r} cannot be named {name!r}, "
+                              f"category {other!r} already is")
+            owners[name] = slug
+
+        # New products must be complete; existing ones may update a few columns
+        existing = set()
+        for batch in _chunks(list(seen), self.batch_size):
+            existing.update(Product.objects.filter(slug__in=batch).values_list('slug', flat=True))
+        for row in rows:
+            missing = [name for name in REQUIRED_FOR_NEW if name not in row] if row['slug'] not in existing else []
+            if missing:
+                errors.append(f"line {seen[row['slug']]}: new product {row['slug']!r} needs {', '.join(missing)}")
+        if errors:
+            raise CatalogImportError(errors)
+        return rows
+
+    def import_categories(self, rows):
+        existing, upserts = _category_upserts(rows)
+        for slug, name in upserts.items():
+            self.change('+' if slug not in existing else '~', 'category', slug,
+                        f"name {existing[slug]!r} -> {name!r}" if slug in existing else '')
+        self.result.categories = len(upserts)
+        if self.dry_run:
+            return {}
+        Category.objects.bulk_create(
+            [Category(slug=slug, name=name) for slug, name in upserts.items()],
+            update_conflicts=True, unique_fields=['slug'], update_fields=['name'],
+        )
+        return dict(Category.objects.filter(slug__in={row['category'] for row in rows if 'category' in row})
+                    .values_list('slug', 'id'))
+
+    def import_flavors(self, rows):
+        wanted = {name for row in rows for name in row.get('flavors', [])}
+        existing = set(Flavor.objects.filter(name__in=wanted).values_list('name', flat=True))
+        new = sorted(wanted - existing)
+        for name in new:
+            self.change('+', 'flavor', name)
+        self.result.flavors = len(new)
+        if self.dry_run:
+            return {}
+        Flavor.objects.bulk_create([Flavor(name=name) for name in new], ignore_conflicts=True)
+        return dict(Flavor.objects.filter(name__in=wanted).values_list('name', 'id'))
+
+    def import_products(self, rows, categories, flavors):
+        existing = {
+            product['slug']: product for product in Product.objects.filter(slug__in=[row['slug'] for row in rows])
+            .values('id', 'slug', 'category_id', 'category__slug', *PRODUCT_FIELDS)
+        }
+        through = Product.flavors.through
+        current_flavors = {}
+        for product_id, name in through.objects.filter(
+                product_id__in=[product['id'] for product in existing.values()]).values_list('product_id', 'flavor__name'):
+            current_flavors.setdefault(product_id, set()).add(name)
+
+        upserts, relink = [], []
+        for row in rows:
+            if 'image' in row:
+                row['image'] = self.attach_image(row['image'])
+            old = existing.get(row['slug'])
+            before = {**old, 'category': old['category__slug'], 'image': old['image'] or ''} if old else {}
+            after = {**(before or PRODUCT_DEFAULTS), **{key: row[key] for key in [*PRODUCT_FIELDS, 'category'] if key in row}}
+            changed = [name for name in [*PRODUCT_FIELDS, 'category'] if before.get(name) != after[name]] if old else []
+            old_flavors = sorted(current_flavors.get(old['id'], set())) if old else []
+            flavors_changed = 'flavors' in row and row['flavors'] != old_flavors
+
+            if not old:
+                self.result.created += 1
+                self.change('+', 'product', row['slug'])
+            elif changed or flavors_changed:
+                self.result.updated += 1
+                details = [f"{name} {before.get(name)!s} -> {after[name]!s}" for name in changed]
+                if flavors_changed:
+                    details.append(f"flavors {old_flavors} -> {row['flavors']}")
+                self.change('~', 'product', row['slug'], ', '.join(details))
+            else:
+                self.result.unchanged += 1
+                continue
+
+            if self.dry_run:
+                continue
+            if not old or changed:
+                upserts.append(Product(
+                    slug=row['slug'], category_id=categories[row['category']] if 'category' in row else old['category_id'],
+                    **{name: after[name] for name in PRODUCT_FIELDS},
+                ))
+            if 'flavors' in row and (not old or flavors_changed):
+                relink.append(row)
+
+        if self.dry_run:
+            return
+        Product.objects.bulk_create(
+            upserts, update_conflicts=True, unique_fields=['slug'], update_fields=[*PRODUCT_FIELDS, 'category'],
+        )
+        if relink:
+            ids = dict(Product.objects.filter(slug__in=[row['slug'] for row in relink]).values_list('slug', 'id'))
+            through.objects.filter(product_id__in=ids.values()).delete()
+            through.objects.bulk_create([
+                through(product_id=ids[row['slug']], flavor_id=flavors[name])
+                for row in relink for name in row['flavors']
+            ])
+
+    def image_name(self, image):
+        """Name the ``image`` column is stored under: as given, or under products/ when copied in."""
+        if not self.images_dir:
+            return image
+        return Product._meta.get_field('image').generate_filename(None, os.path.basename(image))
+
+    def attach_image(self, image):
+        """Storage name for ``image``, copied in from ``images_dir`` unless already uploaded.
+
+        A different file already stored under the same name is kept; the new
+        one is saved under a name the storage picks.
+        """
+        if not self.images_dir:
+            return image
+        name = self.image_name(image)
+        path = os.path.join(self.images_dir, image)
+        if self.dry_run or (self.storage.exists(name) and _same_content(path, self.storage, name)):
+            return name
+        with open(path, 'rb') as f:
+            name = self.storage.save(name, File(f), max_length=Product._meta.get_field('image').max_length)
+        self.copied.append(name)
+        self.result.images += 1
+        return name
+
+    def refresh(self):
+        for name in self.copied:
+            try:
+                generate_derivatives(name, self.storage)
+            except IMAGE_ERRORS:
+                logger.warning("Could not create derivatives for %s", name, exc_info=True)
+        get_search_backend().rebuild()
+        bump_catalog_version()
+        invalidate_home('featured', 'categories')
+        invalidate_flavor_menu()
+
+    def change(self, sign, kind, key, details=''):
+        if self.dry_run:
+            self.result.changes.append(f"{sign} {kind} {key}" + (f": {details}" if details else ''))
@@ -1,6 +1,13 @@
-from .models import Flavor
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_catalog_version, get_flavor_menu
+from .cart import Cart
+
 
 def global_context(request):
+    # Lazy: pages that never render the flavor menu don't touch cache or DB
     return {
-        'flavors': Flavor.objects.all()
-    }
\ No newline at end of file
+        'flavors': SimpleLazyObject(get_flavor_menu),
+        'catalog_version': SimpleLazyObject(get_catalog_version),
+        'cart_count': SimpleLazyObject(lambda: Cart(request).line_count),
+    }
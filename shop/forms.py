@@ -2,6 +2,7 @@
 from django import forms
 from .models import Order, FAQ , Feedback
 from django.utils import timezone
+from .production import check_capacity
 
 class CheckoutForm(forms.ModelForm):
     
@@ -17,6 +18,17 @@ class CheckoutForm(forms.ModelForm):
            'note': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Any special instructions?'}),
             'address': forms.Textarea(attrs={'rows': 2, 'placeholder': 'Full address (required for delivery)'}),
         }
+
+    def __init__(self, *args, pieces=1, **kwargs):
+        # Cakes in the cart, checked against the delivery date's capacity
+        self.pieces = pieces
+        super().__init__(*args, **kwargs)
+
+    def clean_delivery_date(self):
+        delivery_date = self.cleaned_data['delivery_date']
+        check_capacity(delivery_date, self.pieces)
+        return delivery_date
+
     def clean(self):
         cleaned_data = super().clean()
         method = cleaned_data.get('delivery_method')
@@ -40,6 +52,11 @@ class CustomCakeForm(forms.ModelForm):
             'note': forms.Textarea(attrs={'rows': 2}),
             'design_image': forms.FileInput(attrs={'accept': 'image/*'}),
         }
+
+    def clean_delivery_date(self):
+        delivery_date = self.cleaned_data['delivery_date']
+        check_capacity(delivery_date, 1)
+        return delivery_date
         
 # shop/forms.py
 class FAQForm(forms.ModelForm):
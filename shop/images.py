@@ -0,0 +1,159 @@
+# shop/images.py
+import os
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# name -> max width in px; images are never upscaled
+SIZES = {
+    'thumb': 200,
+    'card': 480,
+    'detail': 960,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (app_label.Model, image field) pairs that get derivatives
+IMAGE_FIELDS = [
+    ('shop.Product', 'image'),
+    ('shop.Category', 'image'),
+    ('shop.Review', 'image'),
+    ('shop.Feedback', 'photo'),
+    ('shop.CustomCakeRequest', 'design_image'),
+]
+
+# Raised by broken or hostile uploads (including decompression bombs); callers log and serve the original
+IMAGE_ERRORS = (OSError, ValueError, EOFError, Image.DecompressionBombError)
+
+# Seconds a "no derivatives yet" answer is trusted before storage is asked again
+MISSING_RECHECK = getattr(settings, 'IMAGE_DERIVATIVES_RECHECK', 300)
+
+
+def derivative_name(name, size, fmt):
+    """``products/cake.jpg`` -> ``products/cake__card.webp``, next to the original."""
+    root, _ = os.path.splitext(name)
+    return f'{root}__{size}.{fmt}'
+
+
+# (storage location, name) pairs known to have derivatives, and those last seen
+# without them -> when; the backfill runs in another process, so misses expire
+_generated = set()
+_missing = {}
+# (storage location, name) -> {size: width actually written}
+_widths = {}
+
+
+def _cache_key(name, storage):
+    return getattr(storage, 'location', ''), name
+
+
+def has_derivatives(name, storage=default_storage):
+    key = _cache_key(name, storage)
+    if key in _generated:
+        return True
+    if time.monotonic() - _missing.get(key, float('-inf')) < MISSING_RECHECK:
+        return False
+    # The largest JPEG is written last, so it marks a complete set
+    if storage.exists(derivative_name(name, 'detail', 'jpeg')):
+        _generated.add(key)
+        _missing.pop(key, None)
+        return True
+    _missing[key] = time.monotonic()
+    return False
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """Write every size/format of ``name``; returns the number of files written."""
+    if not name or (not force and has_derivatives(name, storage)):
+        return 0
+    with storage.open(name) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image = image.convert('RGB')
+
+    written = 0
+    widths = {}
+    for size, width in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        widths[size] = resized.width
+        for fmt in ['webp', 'jpeg']:
+            pil_format, params = FORMATS[fmt]
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **params)
+            target = derivative_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+            written += 1
+    _generated.add(_cache_key(name, storage))
+    _missing.pop(_cache_key(name, storage), None)
+    _widths[_cache_key(name, storage)] = widths
+    return written
+
+
+def derivative_widths(name, storage=default_storage):
+    """Pixel width of each size of ``name``; smaller than ``SIZES`` for small originals."""
+    key = _cache_key(name, storage)
+    if key not in _widths:
+        widths = {}
+        for size in SIZES:
+            # Image.open only parses the header
+            with storage.open(derivative_name(name, size, 'jpeg')) as f:
+                widths[size] = Image.open(f).width
+        _widths[key] = widths
+    return _widths[key]
+
+
+class ImageDerivatives:
+    """URLs of the resized copies of an ``ImageFieldFile``, falling back to the original."""
+
+    def __init__(self, fieldfile):
+        self.fieldfile = fieldfile
+
+    def __bool__(self):
+        return bool(self.fieldfile)
+
+    @property
+    def available(self):
+        if not self.fieldfile:
+            return False
+        if not hasattr(self, '_available'):
+            self._available = has_derivatives(self.fieldfile.name, self.fieldfile.storage)
+        return self._available
+
+    def url(self, size='card', fmt='jpeg'):
+        if not self.available:
+            return self.fieldfile.url if self.fieldfile else ''
+        return self.fieldfile.storage.url(derivative_name(self.fieldfile.name, size, fmt))
+
+    def srcset(self, fmt='jpeg'):
+        if not self.available:
+            # No WebP copies yet; a JPEG/PNG original is still valid for the <img> srcset
+            return '' if fmt == 'webp' else self.fieldfile.url if self.fieldfile else ''
+        try:
+            widths = derivative_widths(self.fieldfile.name, self.fieldfile.storage)
+        except IMAGE_ERRORS:
+            return '' if fmt == 'webp' else self.fieldfile.url
+        # Sizes capped at the original's width are the same file twice over; list each width once
+        candidates = {}
+        for size, width in widths.items():
+            candidates.setdefault(width, size)
+        return ', '.join(f'{self.url(size, fmt)} {width}w' for width, size in candidates.items())
+
+    @property
+    def thumb(self):
+        return self.url('thumb')
+
+    @property
+    def card(self):
+        return self.url('card')
+
+    @property
+    def detail(self):
+        return self.url('detail')
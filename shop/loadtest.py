@@ -0,0 +1,217 @@
+# shop/loadtest.py
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.db import connection
+
+from .models import Category, Flavor, Order, OutboundEmail, Product
+from .orders import delete_orders
+from .search import get_search_backend
+
+PREFIX = 'loadtest'
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+# === SYNTHETIC DATA ===
+def seed(products=200, categories=6):
+    """Create a throwaway catalog; returns the product slugs."""
+    category_objs = Category.objects.bulk_create([
+        Category(name=f'{PREFIX} {i}', slug=f'{PREFIX}-{i}') for i in range(categories)
+    ])
+    flavors = list(Flavor.objects.all()[:10])
+    product_objs = Product.objects.bulk_create([
+        Product(
+            name=f'{PREFIX.title()} Cake {i}', slug=f'{PREFIX}-cake-{i}',
+            category=category_objs[i % categories], description=f'Synthetic chocolate cake {i}',
+            price=Decimal(300 + i % 500), featured=i % 10 == 0, image='products/loadtest.jpg',
+        )
+        for i in range(products)
+    ])
+    if flavors:
+        Product.flavors.through.objects.bulk_create([
+            Product.flavors.through(product=product, flavor=flavors[i % len(flavors)])
+            for i, product in enumerate(product_objs)
+        ])
+    get_search_backend().rebuild()
+    return [product.slug for product in product_objs]
+
+
+def cleanup():
+    OutboundEmail.objects.filter(subject__endswith=f'- {PREFIX}').delete()
+    # Through delete_orders, so the slots booked on the real database are released
+    delete_orders(Order.objects.filter(name=PREFIX))
+    Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+    get_search_backend().rebuild()
+
+
+# === SERVERS ===
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server(application):
+    """Serve ``application`` on an ephemeral localhost port in a background thread."""
+    server = make_server('127.0.0.1', 0, application, server_class=_ThreadingWSGIServer,
+                         handler_class=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def gunicorn_server(workers, settings_module):
+    """Start ``gunicorn AR_kitchen.wsgi`` locally for the duration of the run."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'AR_kitchen.wsgi:application',
+         '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module},
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+# === VIRTUAL USERS ===
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    """One shopper with its own cookie jar: browse -> add to cart -> checkout."""
+
+    def __init__(self, base_url, slugs, results, rng):
+        self.base_url = base_url
+        self.slugs = slugs
+        self.results = results
+        self.rng = rng
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def hit(self, step, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            # 3xx land here because redirects are not followed
+            status, timing = e.code, e.headers.get('Server-Timing', '')
+        except OSError:
+            status, timing = 0, ''
+        elapsed = time.perf_counter() - start
+        match = QUERIES_RE.search(timing)
+        self.results.append((step, elapsed, status, int(match.group(1)) if match else None))
+        return status
+
+    def session(self):
+        self.hit('home', '/')
+        self.hit('shop', '/shop/')
+        self.hit('search', '/shop/?' + urllib.parse.urlencode({'q': 'chocolate'}))
+        self.hit('category', f'/category/{PREFIX}-{self.rng.randrange(6)}/')
+        slug = self.rng.choice(self.slugs)
+        self.hit('product', f'/product/{slug}/')
+        for _ in range(self.rng.randint(1, 3)):
+            self.hit('add_to_cart', f'/add-to-cart/{self.rng.choice(self.slugs)}/', {'quantity': 1},
+                     {'X-CSRFToken': self.csrf_token(), 'X-Requested-With': 'XMLHttpRequest'})
+        self.hit('cart', '/cart/')
+        self.hit('checkout', '/checkout/')
+        self.hit('place_order', '/checkout/', {
+            'csrfmiddlewaretoken': self.csrf_token(), 'name': PREFIX, 'phone': '01700000000',
+            'delivery_method': 'pickup', 'delivery_date': (date.today() + timedelta(days=1)).isoformat(),
+        })
+
+
+def run(base_url, slugs, users, sessions, seed_value=0):
+    """Run ``users`` concurrent shoppers for ``sessions`` sessions each; returns (results, elapsed)."""
+    results = []
+
+    def worker(n):
+        user = VirtualUser(base_url, slugs, results, random.Random(seed_value + n))
+        for _ in range(sessions):
+            user.session()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    steps = {}
+    for step, latency, status, queries in results:
+        steps.setdefault(step, []).append((latency, status, queries))
+
+    def stats(rows):
+        latencies = [row[0] for row in rows]
+        queries = [row[2] for row in rows if row[2] is not None]
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if not 200 <= row[1] < 400),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    return {
+        'total': {**stats([row[1:] for row in results]), 'seconds': round(elapsed, 3), 'rps': round(len(results) / elapsed, 2)},
+        'steps': {step: stats(rows) for step, rows in steps.items()},
+        'database': connection.vendor,
+    }
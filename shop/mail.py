@@ -0,0 +1,99 @@
+# shop/mail.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import time_mail
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_DELAY = getattr(settings, 'OUTBOX_RETRY_DELAY', 60)  # seconds, doubled per attempt
+CLAIM_TIMEOUT = getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 300)
+SUBJECT_MAX_LENGTH = OutboundEmail._meta.get_field('subject').max_length
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Drop-in for ``send_mail`` that stores the message for the outbox worker.
+
+    Subjects longer than the column (a long name on the contact form) are cut.
+    """
+    with time_mail('queue'):
+        return OutboundEmail.objects.create(
+            subject=subject[:SUBJECT_MAX_LENGTH],
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=', '.join(recipient_list),
+        )
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages so concurrent workers skip them."""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT)
+        )
+    return emails
+
+
+def _send_chunk(emails):
+    """Send ``emails`` over one SMTP connection; returns ``{pk: error or None}``."""
+    results = {}
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        return {email.pk: repr(e) for email in emails}
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipient_list,
+                connection=connection,
+            )
+            try:
+                with time_mail('smtp'):
+                    message.send()
+                results[email.pk] = None
+            except Exception as e:
+                results[email.pk] = repr(e)
+    finally:
+        connection.close()
+    return results
+
+
+def send_batch(emails, workers=1):
+    """Deliver claimed messages and record the outcome; returns ``(sent, failed)``."""
+    if not emails:
+        return 0, 0
+    chunks = [emails[i::workers] for i in range(workers) if emails[i::workers]]
+    results = {}
+    if len(chunks) == 1:
+        results.update(_send_chunk(chunks[0]))
+    else:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            for chunk_results in pool.map(_send_chunk, chunks):
+                results.update(chunk_results)
+
+    now = timezone.now()
+    sent_ids = [pk for pk, error in results.items() if error is None]
+    OutboundEmail.objects.filter(pk__in=sent_ids).update(status='sent', sent_at=now, last_error='')
+
+    failed = [email for email in emails if results.get(email.pk)]
+    for email in failed:
+        email.attempts += 1
+        email.last_error = results[email.pk]
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = 'failed'
+        else:
+            email.next_attempt_at = now + timedelta(seconds=RETRY_DELAY * 2 ** (email.attempts - 1))
+    OutboundEmail.objects.bulk_update(failed, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return len(sent_ids), len(failed)
@@ -0,0 +1,74 @@
+# shop/management/commands/benchmark_cart.py
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from shop.models import Category, Product
+
+PREFIX = 'bench-cart'
+STORAGES = {
+    'session': 'shop.cart.SessionCartStorage',
+    'cache': 'shop.cart.CacheCartStorage',
+    'cookie': 'shop.cart.SignedCookieCartStorage',
+}
+
+
+class Command(BaseCommand):
+    help = "Measure add-to-cart throughput with concurrent shoppers for each cart storage backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent shoppers")
+        parser.add_argument('--requests', type=int, default=200, help="Add-to-cart requests per shopper")
+        parser.add_argument('--storage', choices=sorted(STORAGES), action='append',
+                            help="Storage to test (repeatable); all by default")
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(slug=PREFIX, defaults={'name': PREFIX})
+        products = Product.objects.bulk_create([
+            Product(name=f"{PREFIX} {i}", slug=f"{PREFIX}-{i}", category=category, description='', price=100 + i)
+            for i in range(5)
+        ])
+        urls = [reverse('shop:add_to_cart', args=[product.slug]) for product in products]
+        self.stdout.write(
+            f"{connection.vendor}: {options['threads']} shoppers x {options['requests']} add-to-cart requests"
+        )
+        try:
+            for name in options['storage'] or ['session', 'cache', 'cookie']:
+                with override_settings(CART_STORAGE=STORAGES[name], ALLOWED_HOSTS=['testserver']):
+                    self.report(name, urls, options['threads'], options['requests'])
+        finally:
+            category.delete()
+
+    def report(self, label, urls, threads, requests):
+        errors = []
+
+        def shopper():
+            client = Client()
+            try:
+                for i in range(requests):
+                    try:
+                        response = client.post(urls[i % len(urls)], {'quantity': 1})
+                        if response.status_code != 200:
+                            errors.append(response.status_code)
+                    except OperationalError as e:
+                        # SQLite "database is locked" under contention
+                        errors.append(str(e))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=shopper) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        total = threads * requests
+        self.stdout.write(
+            f"{label:>8}: {total / elapsed:8.1f} req/sec ({elapsed * 1000 / total:.2f} ms/req), "
+            f"{len(errors)} errors"
+        )
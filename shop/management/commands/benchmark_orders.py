@@ -0,0 +1,57 @@
+# shop/management/commands/benchmark_orders.py
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.models import Category, Order, OrderItem, Product
+from shop.orders import delete_orders, place_order
+
+PREFIX = 'bench-order'
+
+
+class Command(BaseCommand):
+    help = "Measure checkout order placement throughput (orders/sec) on the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--items', type=int, default=10, help="Line items per order")
+        parser.add_argument('--legacy', action='store_true', help="Also time the old per-item create path")
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(slug=PREFIX, defaults={'name': PREFIX})
+        products = Product.objects.bulk_create([
+            Product(name=f"{PREFIX} {i}", slug=f"{PREFIX}-{i}", category=category, description='', price=100 + i)
+            for i in range(options['items'])
+        ])
+        quantities = {product.slug: 1 for product in products}
+        self.stdout.write(f"{connection.vendor}: {options['orders']} orders x {options['items']} items")
+
+        try:
+            self.report('bulk', options['orders'], lambda: place_order(self.new_order(), quantities))
+            if options['legacy']:
+                self.report('legacy', options['orders'], lambda: self.legacy_place(products))
+        finally:
+            delete_orders(Order.objects.filter(name=PREFIX))
+            category.delete()
+
+    def new_order(self):
+        return Order(
+            name=PREFIX, phone='0', delivery_method='pickup',
+            delivery_date=date.today() + timedelta(days=1),
+        )
+
+    def legacy_place(self, products):
+        order = self.new_order()
+        order.total = sum(product.price for product in products)
+        order.save()
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=1)
+
+    def report(self, label, count, place):
+        start = time.perf_counter()
+        for _ in range(count):
+            place()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:>8}: {count / elapsed:8.1f} orders/sec ({elapsed * 1000 / count:.2f} ms/order)")
@@ -0,0 +1,55 @@
+# shop/management/commands/benchmark_pagination.py
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from shop.models import Category, Product
+from shop.pagination import SORTS, KeysetPaginator, encode_cursor
+
+PER_PAGE = 9
+
+
+class Command(BaseCommand):
+    help = "Compare OFFSET and keyset pagination latency at shallow and deep shop pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Everything is rolled back, so the benchmark never touches real data
+        with transaction.atomic():
+            category = Category.objects.create(name='bench-page', slug='bench-page')
+            Product.objects.bulk_create(
+                (Product(name=f'Cake {i}', slug=f'bench-page-{i}', category=category, description='',
+                         price=300 + i % 50 * 10) for i in range(options['products'])),
+                batch_size=2000,
+            )
+            products = Product.objects.available().for_listing()
+            ordering = SORTS['newest']
+            keyset = KeysetPaginator(products, PER_PAGE, ordering)
+
+            self.stdout.write(f"{'page':>6}{'offset ms':>12}{'keyset ms':>12}")
+            for number in options['pages']:
+                cursor = None
+                if number > 1:
+                    # Cursor a visitor would hold after clicking "Next" number - 1 times
+                    last = products.order_by(*ordering)[(number - 1) * PER_PAGE - 1]
+                    cursor = encode_cursor(keyset._key(last), 'next')
+                # A fresh Paginator per request, as in the view, so COUNT(*) is paid every time
+                offset_ms = self.time(lambda: list(Paginator(products, PER_PAGE).get_page(number)), options['repeat'])
+                keyset_ms = self.time(lambda: list(keyset.page(cursor)), options['repeat'])
+                self.stdout.write(f"{number:>6}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+            transaction.set_rollback(True)
+
+    def time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
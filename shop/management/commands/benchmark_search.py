@@ -0,0 +1,69 @@
+# shop/management/commands/benchmark_search.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from shop.models import Category, Product
+from shop.search import get_search_backend
+
+ADJECTIVES = ['classic', 'rich', 'moist', 'creamy', 'fudgy', 'fresh', 'royal', 'dark', 'light', 'premium']
+FLAVORS = ['chocolate', 'vanilla', 'strawberry', 'mango', 'coffee', 'caramel', 'lemon', 'pistachio', 'hazelnut', 'coconut']
+KINDS = ['cake', 'cheesecake', 'mousse', 'brownie', 'tart', 'cupcake', 'gateau', 'pastry', 'roll', 'tub']
+FILLER = ['layered', 'with', 'topped', 'ganache', 'cream', 'sponge', 'glaze', 'crumble', 'berries', 'nuts',
+          'birthday', 'party', 'celebration', 'homemade', 'baked', 'daily', 'soft', 'sweet', 'butter', 'frosting',
+          'the', 'and', 'for', 'a', 'of', 'our', 'best', 'served', 'chilled', 'slice', 'perfect', 'gift']
+QUERIES = ['chocolate', 'choc', 'mango cheesecake', 'pistachio tart', 'fudgy brownie', 'hazlenut']
+
+
+class Command(BaseCommand):
+    help = "Compare product search latency (icontains vs the configured search backend) on a synthetic catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        rng = random.Random(42)
+        # Everything is rolled back, so the benchmark never touches real data
+        with transaction.atomic():
+            category = Category.objects.create(name='bench-search', slug='bench-search')
+            self.stdout.write(f"Seeding {options['products']} products...")
+            Product.objects.bulk_create(
+                (self.fake_product(i, category, rng) for i in range(options['products'])),
+                batch_size=2000,
+            )
+            backend.rebuild()
+
+            # Same shape as the shop view: newest first, a COUNT for the paginator and one page
+            products = Product.objects.available().for_listing()
+            self.stdout.write(f"{'query':<20}{'icontains ms':>14}{type(backend).__name__ + ' ms':>26}")
+            for query in QUERIES:
+                baseline = self.time(lambda: self.icontains(products, query), options['repeat'])
+                searched = self.time(lambda: self.page(backend.search(products, query)), options['repeat'])
+                self.stdout.write(f"{query:<20}{baseline:>14.2f}{searched:>26.2f}")
+            transaction.set_rollback(True)
+
+    def fake_product(self, i, category, rng):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(FLAVORS)} {rng.choice(KINDS)}"
+        description = ' '.join(rng.choice(FILLER) for _ in range(25)) + f' {rng.choice(FLAVORS)}'
+        return Product(name=name.title(), slug=f'bench-search-{i}', category=category,
+                       description=description, price=rng.randint(300, 3000))
+
+    def icontains(self, products, query):
+        return self.page(products.filter(Q(name__icontains=query) | Q(description__icontains=query)))
+
+    def page(self, queryset):
+        return queryset.count(), list(queryset[:9])
+
+    def time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,42 @@
+# shop/management/commands/export_orders.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.exports import export_lines, filter_dates
+from shop.models import CustomCakeRequest, Order
+
+MODELS = {'orders': Order, 'custom-cakes': CustomCakeRequest}
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Not a YYYY-MM-DD date: {value}")
+
+
+class Command(BaseCommand):
+    help = "Stream orders (with their items) or custom cake requests as CSV or JSONL in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('what', choices=MODELS, nargs='?', default='orders')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--delivery-from', type=parse_date)
+        parser.add_argument('--delivery-to', type=parse_date)
+        parser.add_argument('--created-from', type=parse_date)
+        parser.add_argument('--created-to', type=parse_date)
+        parser.add_argument('--output', '-o', help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        queryset = filter_dates(
+            MODELS[options['what']].objects.all(),
+            options['delivery_from'], options['delivery_to'], options['created_from'], options['created_to'],
+        )
+        lines = export_lines(queryset, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
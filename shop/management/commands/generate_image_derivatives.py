@@ -0,0 +1,50 @@
+# shop/management/commands/generate_image_derivatives.py
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from shop.images import IMAGE_ERRORS, IMAGE_FIELDS, generate_derivatives
+
+
+def _generate(name, force):
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except IMAGE_ERRORS as e:
+        return name, 0, repr(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill thumbnail/card/detail WebP and JPEG copies for existing uploads. "
+        "Run it periodically: custom cake designs are only resized here."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Processes to use (default: CPU count)")
+        parser.add_argument('--force', action='store_true', help="Regenerate even if derivatives exist")
+
+    def handle(self, *args, **options):
+        names = set()
+        for label, field in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            names.update(model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                         .values_list(field, flat=True))
+        names = sorted(names)
+        self.stdout.write(f"{len(names)} images to check")
+
+        force = [options['force']] * len(names)
+        if options['workers'] == 1:
+            self.report(map(_generate, names, force))
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                self.report(pool.map(_generate, names, force, chunksize=8))
+
+    def report(self, results):
+        written = failed = 0
+        for name, count, error in results:
+            written += count
+            if error:
+                failed += 1
+                self.stderr.write(f"{name}: {error}")
+        self.stdout.write(f"Wrote {written} files, {failed} images failed")
@@ -0,0 +1,49 @@
+# shop/management/commands/import_catalog.py
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.catalog_import import CatalogImporter, CatalogImportError, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update categories, flavors and products (matched by slug) from a CSV or JSON file. "
+        "Columns: slug, name, description, price, weight, featured, available, category, category_name, "
+        "flavors ('|'-separated in CSV), image. Blank cells leave existing values unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, or .json with a list of products")
+        parser.add_argument('--images', help="Directory the image column is relative to; files are copied into media")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Products per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Print what would change and write nothing")
+
+    def handle(self, *args, **options):
+        if options['images'] and not os.path.isdir(options['images']):
+            raise CommandError(f"Not a directory: {options['images']}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        start = time.perf_counter()
+        importer = CatalogImporter(
+            images_dir=options['images'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+        )
+        try:
+            try:
+                records = read_rows(options['path'])
+            except (OSError, ValueError) as e:
+                # Missing file, bad encoding or bad JSON; problems in the rows are reported below
+                raise CommandError(f"Cannot read {options['path']}: {e}")
+            result = importer.run(records)
+        except CatalogImportError as e:
+            raise CommandError(f"Nothing imported, {len(e.errors)} problem(s):\n{e}")
+
+        for line in result.changes:
+            self.stdout.write(line)
+        self.stdout.write(
+            f"{'Would create' if options['dry_run'] else 'Created'} {result.created}, "
+            f"{'update' if options['dry_run'] else 'updated'} {result.updated} products "
+            f"({result.unchanged} unchanged); {result.categories} categories, {result.flavors} new flavors, "
+            f"{result.images} images copied in {time.perf_counter() - start:.1f}s"
+        )
@@ -0,0 +1,118 @@
+# shop/management/commands/loadtest.py
+import importlib
+import json
+import os
+import subprocess
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from shop import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay browse -> add-to-cart -> checkout sessions with concurrent virtual users "
+        "and report RPS, latency percentiles and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Concurrent virtual users")
+        parser.add_argument('--sessions', type=int, default=5, help="Shopping sessions per user")
+        parser.add_argument('--products', type=int, default=200, help="Synthetic products to seed")
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--url', help="Base URL of an already running server (same database)")
+        target.add_argument('--gunicorn', type=int, metavar='WORKERS',
+                            help="Start a local gunicorn with this many workers")
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--compare', help="Print the difference from a previous results file")
+        parser.add_argument('--keep-data', action='store_true', help="Leave the seeded catalog in place")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        slugs = loadtest.seed(options['products'])
+        try:
+            with self.server(options) as (base_url, target):
+                self.stdout.write(
+                    f"{target}: {options['users']} users x {options['sessions']} sessions against {base_url}"
+                )
+                results, elapsed = loadtest.run(base_url, slugs, options['users'], options['sessions'])
+        finally:
+            if not options['keep_data']:
+                loadtest.cleanup()
+
+        summary = loadtest.summarize(results, elapsed)
+        summary.update({
+            'target': target,
+            'users': options['users'],
+            'sessions': options['sessions'],
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+        })
+        self.report(summary, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    @contextmanager
+    def server(self, options):
+        """Yield ``(base_url, target label)`` for the chosen server."""
+        if options['url']:
+            yield options['url'].rstrip('/'), 'external'
+        elif options['gunicorn']:
+            with loadtest.gunicorn_server(options['gunicorn'], os.environ['DJANGO_SETTINGS_MODULE']) as url:
+                yield url, f"gunicorn x{options['gunicorn']}"
+        else:
+            # Server-Timing must be on before the WSGI handler loads its middleware,
+            # so queries per request can be read from the responses
+            with override_settings(PERF_METRICS=True, PERF_SERVER_TIMING=True,
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+                application = importlib.import_module('AR_kitchen.wsgi').application
+                with loadtest.wsgi_server(application) as url:
+                    yield url, 'in-process'
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, summary, baseline):
+        rows = [('TOTAL', summary['total'])] + list(summary['steps'].items())
+        self.stdout.write(f"{'step':>12} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for step, data in rows:
+            queries = data['queries_per_request']
+            self.stdout.write(
+                f"{step:>12} {data['requests']:>6} {data['errors']:>4} {data['p50_ms']:>8} "
+                f"{data['p95_ms']:>8} {data['p99_ms']:>8} {queries if queries is not None else '-':>8}"
+            )
+        self.stdout.write(f"{summary['total']['rps']} req/sec over {summary['total']['seconds']}s")
+
+        if baseline:
+            self.stdout.write(f"Compared with {baseline.get('commit') or 'baseline'}:")
+            old, new = baseline['total'], summary['total']
+            self.stdout.write(f"  rps {old['rps']} -> {new['rps']} ({self.change(old['rps'], new['rps'])})")
+            for step, data in summary['steps'].items():
+                if step in baseline['steps']:
+                    before = baseline['steps'][step]['p95_ms']
+                    self.stdout.write(
+                        f"  {step} p95 {before} -> {data['p95_ms']} ms ({self.change(before, data['p95_ms'])})"
+                    )
+
+    @staticmethod
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
@@ -0,0 +1,35 @@
+# shop/management/commands/rebuild_sales_rollup.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.analytics import rebuild
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Not a YYYY-MM-DD date: {value}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the DailySales rollup from order history, a window of delivery dates at a time "
+        "(needed after editing or deleting orders, which the incremental update does not track)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_date, help="First delivery date to rebuild (default: oldest order)")
+        parser.add_argument('--until', type=parse_date, help="Last delivery date to rebuild (default: newest order)")
+        parser.add_argument('--days', type=int, default=31, help="Delivery dates per chunk")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        total = 0
+        for window, written in rebuild(options['since'], options['until'], days=options['days']):
+            total += written
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{window}: {written} rows")
+        self.stdout.write(f"Rebuilt sales rollup with {total} rows")
@@ -0,0 +1,13 @@
+# shop/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from shop.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Re-sync the product search index (needed after bulk_create/update, which skip signals)."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(f"Rebuilt search index with {type(backend).__name__}")
@@ -0,0 +1,45 @@
+# shop/management/commands/send_queued_mail.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.mail import claim_batch, send_batch
+from shop.metrics import registry
+
+
+def smtp_seconds():
+    return registry.snapshot()['mail'].get('smtp', {}).get('seconds', 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued OutboundEmail messages, reusing SMTP connections and retrying with backoff. "
+        "With PERF_METRICS on, each batch line reports its SMTP time: this process's "
+        "timings are not part of the web server's /metrics/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=1, help="Parallel SMTP connections per batch")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when the queue is empty")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls with --loop")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        while True:
+            emails = claim_batch(options['batch_size'])
+            if emails:
+                before = smtp_seconds()
+                sent, failed = send_batch(emails, workers=options['workers'])
+                line = f"Sent {sent}, failed {failed}"
+                if getattr(settings, 'PERF_METRICS', False):
+                    line += f" ({smtp_seconds() - before:.3f}s SMTP)"
+                self.stdout.write(line)
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
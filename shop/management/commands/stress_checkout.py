@@ -0,0 +1,107 @@
+# shop/management/commands/stress_checkout.py
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from shop.models import Category, Order, OutboundEmail, Product
+from shop.orders import delete_orders
+
+PREFIX = 'bench-stress'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer add_to_cart and checkout from concurrent shoppers; report lock errors and latency. "
+        "On SQLite run it with SQLITE_WAL=1 to measure the tuned profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent shoppers")
+        parser.add_argument('--iterations', type=int, default=25, help="Add-to-cart + checkout rounds per shopper")
+        parser.add_argument('--untuned', action='store_true',
+                            help="Compare against SQLite defaults: rollback journal, no pragmas, deferred BEGIN")
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(slug=PREFIX, defaults={'name': PREFIX})
+        products = Product.objects.bulk_create([
+            Product(name=f"{PREFIX} {i}", slug=f"{PREFIX}-{i}", category=category, description='', price=100 + i)
+            for i in range(5)
+        ])
+        untuned = {
+            'SQLITE_PRAGMAS': {'journal_mode': 'DELETE'},  # WAL is persistent, so switch it back explicitly
+            'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+        } if options['untuned'] else {}
+        # Shoppers open fresh connections, so the pragmas apply to them
+        connection.close()
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], **untuned):
+                self.run(products, options['threads'], options['iterations'])
+        finally:
+            OutboundEmail.objects.filter(subject__endswith=f'- {PREFIX}').delete()
+            delete_orders(Order.objects.filter(name=PREFIX))
+            category.delete()
+
+    def run(self, products, threads, iterations):
+        latencies = {'add_to_cart': [], 'checkout': []}
+        errors = {'locked': 0, 'other': 0}
+        lock = threading.Lock()
+        checkout = {
+            'name': PREFIX, 'phone': '01700000000', 'delivery_method': 'pickup',
+            'delivery_date': (date.today() + timedelta(days=1)).isoformat(),
+        }
+
+        def timed(client, name, url, data):
+            start = time.perf_counter()
+            try:
+                response = client.post(url, data)
+                failed = response.status_code >= 400
+                kind = 'other'
+            except OperationalError as e:
+                failed = True
+                kind = 'locked' if 'locked' in str(e) else 'other'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[name].append(elapsed)
+                if failed:
+                    errors[kind] += 1
+
+        def shopper(n):
+            client = Client()
+            try:
+                for i in range(iterations):
+                    product = products[(n + i) % len(products)]
+                    timed(client, 'add_to_cart', reverse('shop:add_to_cart', args=[product.slug]), {'quantity': 1})
+                    timed(client, 'checkout', reverse('shop:checkout'), checkout)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=shopper, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        total = sum(len(values) for values in latencies.values())
+        self.stdout.write(
+            f"{connection.vendor}: {threads} shoppers x {iterations} rounds, "
+            f"{total / elapsed:.1f} req/sec, {errors['locked']} lock errors, {errors['other']} other errors"
+        )
+        for name, values in latencies.items():
+            self.stdout.write(
+                f"{name:>12}: p50 {percentile(values, 50) * 1000:7.1f} ms  "
+                f"p99 {percentile(values, 99) * 1000:7.1f} ms  max {max(values, default=0) * 1000:7.1f} ms"
+            )
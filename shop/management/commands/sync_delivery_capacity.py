@@ -0,0 +1,22 @@
+# shop/management/commands/sync_delivery_capacity.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.production import BOOKING_HORIZON_DAYS, sync_capacity
+
+
+class Command(BaseCommand):
+    help = "Precompute DeliveryCapacity rows over the booking horizon (run daily, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=BOOKING_HORIZON_DAYS, help="Days ahead to cover")
+        parser.add_argument('--recount', action='store_true',
+                            help="Also reset existing counters from the orders (after deleting orders)")
+
+    def handle(self, *args, **options):
+        start = timezone.localdate()
+        end = start + timedelta(days=max(options['days'], 1) - 1)
+        written = sync_capacity(start, end, recount=options['recount'])
+        self.stdout.write(f"{written} delivery dates written for {start} to {end}")
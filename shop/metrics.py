@@ -0,0 +1,252 @@
+# shop/metrics.py
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Timings of the request being handled by this thread/task, if any
+_current = ContextVar('shop_request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('queries', 'db', 'template', 'cache_hits', 'cache_misses', 'mail', '_rendering')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.template = self.mail = 0.0
+        self.cache_hits = self.cache_misses = 0
+        self._rendering = False
+
+
+# === HISTOGRAMS ===
+class Histogram:
+    """Cumulative bucket counts per label value, Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        counts, total = self.series.get(label, ([0] * (len(self.buckets) + 1), 0.0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self.series[label] = (counts, total + value)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.mail = Histogram(DURATION_BUCKETS)
+        # view -> summed components
+        self.totals = {}
+
+    def record_request(self, view, elapsed, timings):
+        with self.lock:
+            self.durations.observe(view, elapsed)
+            self.queries.observe(view, timings.queries)
+            totals = self.totals.setdefault(view, dict.fromkeys(
+                ['db_seconds', 'template_seconds', 'mail_seconds', 'cache_hits', 'cache_misses'], 0))
+            totals['db_seconds'] += timings.db
+            totals['template_seconds'] += timings.template
+            totals['mail_seconds'] += timings.mail
+            totals['cache_hits'] += timings.cache_hits
+            totals['cache_misses'] += timings.cache_misses
+
+    def record_mail(self, kind, elapsed):
+        with self.lock:
+            self.mail.observe(kind, elapsed)
+
+    def snapshot(self):
+        with self.lock:
+            views = {}
+            for view, (counts, total) in self.durations.series.items():
+                query_counts, query_total = self.queries.series[view]
+                views[view] = {
+                    'requests': counts[-1],
+                    'seconds': round(total, 6),
+                    'duration_buckets': dict(zip(map(str, DURATION_BUCKETS + ('+Inf',)), counts)),
+                    'queries': query_total,
+                    'query_buckets': dict(zip(map(str, QUERY_BUCKETS + ('+Inf',)), query_counts)),
+                    **{key: round(value, 6) for key, value in self.totals[view].items()},
+                }
+            mail = {
+                kind: {'count': counts[-1], 'seconds': round(total, 6)}
+                for kind, (counts, total) in self.mail.series.items()
+            }
+        return {'views': views, 'mail': mail}
+
+
+registry = Registry()
+
+
+# === RECORDING HOOKS ===
+def note_cache(hits=0, misses=0):
+    timings = _current.get()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+@contextmanager
+def time_mail(kind):
+    """Time an email step (queueing in a view, SMTP delivery in the worker).
+
+    Recorded in the calling process's ``registry``: SMTP timings stay in the
+    send_queued_mail worker, which prints them, and never reach /metrics/.
+    """
+    if not getattr(settings, 'PERF_METRICS', False):
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current.get()
+        if timings is not None:
+            timings.mail += elapsed
+        registry.record_mail(kind, elapsed)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.queries += 1
+            timings.db += time.perf_counter() - start
+
+
+def _install_template_timer():
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'timed', False):
+        return
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None or timings._rendering:
+            return original(self, *args, **kwargs)
+        # Only the outermost render is timed; included templates are part of it
+        timings._rendering = True
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timings.template += time.perf_counter() - start
+            timings._rendering = False
+
+    render.timed = True
+    Template.render = render
+
+
+class PerformanceMiddleware:
+    """Per-view wall time, DB, template, cache and mail timings, kept in ``registry``.
+
+    Removed from the stack entirely (``MiddlewareNotUsed``) unless
+    ``settings.PERF_METRICS`` is on. Histograms are per process.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', False)
+        _install_template_timer()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        registry.record_request(match.view_name if match else 'unresolved', elapsed, timings)
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(elapsed, timings)
+        return response
+
+
+def server_timing(elapsed, timings):
+    return ', '.join([
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+        f'tpl;dur={timings.template * 1000:.1f}',
+        f'cache;desc="{timings.cache_hits} hit {timings.cache_misses} miss"',
+        f'mail;dur={timings.mail * 1000:.1f}',
+        f'total;dur={elapsed * 1000:.1f}',
+    ])
+
+
+# === EXPORT ===
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def prometheus_text():
+    """The registry in Prometheus text exposition format."""
+    snapshot = registry.snapshot()
+    lines = [
+        '# HELP shop_request_duration_seconds Wall time per request.',
+        '# TYPE shop_request_duration_seconds histogram',
+    ]
+    for view, data in snapshot['views'].items():
+        for bound, count in data['duration_buckets'].items():
+            lines.append(f'shop_request_duration_seconds_bucket{_labels(view=view, le=bound)} {count}')
+        lines.append(f'shop_request_duration_seconds_sum{_labels(view=view)} {data["seconds"]}')
+        lines.append(f'shop_request_duration_seconds_count{_labels(view=view)} {data["requests"]}')
+
+    lines += [
+        '# HELP shop_request_queries Database queries per request.',
+        '# TYPE shop_request_queries histogram',
+    ]
+    for view, data in snapshot['views'].items():
+        for bound, count in data['query_buckets'].items():
+            lines.append(f'shop_request_queries_bucket{_labels(view=view, le=bound)} {count}')
+        lines.append(f'shop_request_queries_sum{_labels(view=view)} {data["queries"]}')
+        lines.append(f'shop_request_queries_count{_labels(view=view)} {data["requests"]}')
+
+    for key, help_text in [
+        ('db_seconds', 'Time spent in database queries.'),
+        ('template_seconds', 'Time spent rendering templates.'),
+        ('mail_seconds', 'Time spent queueing email.'),
+        ('cache_hits', 'Catalog and home cache hits.'),
+        ('cache_misses', 'Catalog and home cache misses.'),
+    ]:
+        name = f'shop_request_{key}_total'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, data in snapshot['views'].items():
+            lines.append(f'{name}{_labels(view=view)} {data[key]}')
+
+    lines += [
+        '# HELP shop_mail_seconds Time spent on email steps in this process '
+        '(queueing; SMTP delivery is timed by the send_queued_mail worker, in its output).',
+        '# TYPE shop_mail_seconds summary',
+    ]
+    for kind, data in snapshot['mail'].items():
+        lines.append(f'shop_mail_seconds_sum{_labels(kind=kind)} {data["seconds"]}')
+        lines.append(f'shop_mail_seconds_count{_labels(kind=kind)} {data["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 16:03
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_future_bookings(apps, schema_editor):
+    """Start the counters from the orders already taken for upcoming dates."""
+    DeliveryCapacity = apps.get_model('shop', 'DeliveryCapacity')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    CustomCakeRequest = apps.get_model('shop', 'CustomCakeRequest')
+    today = datetime.date.today()
+    counts = {}
+    ordered = (
+        OrderItem.objects.filter(order__delivery_date__gte=today)
+        .values_list('order__delivery_date').annotate(total=Sum('quantity')).order_by()
+    )
+    custom = (
+        CustomCakeRequest.objects.filter(delivery_date__gte=today)
+        .values_list('delivery_date').annotate(total=Count('id')).order_by()
+    )
+    for day, total in [*ordered, *custom]:
+        counts[day] = counts.get(day, 0) + total
+    DeliveryCapacity.objects.bulk_create([DeliveryCapacity(date=day, booked=total) for day, total in counts.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='Cakes for this date; empty uses DAILY_CAPACITY, 0 closes the date', null=True)),
+                ('booked', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'delivery capacity',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(count_future_bookings, migrations.RunPython.noop),
+    ]
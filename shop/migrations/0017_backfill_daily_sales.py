@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+
+WINDOW_DAYS = 31
+
+
+def backfill_daily_sales(apps, schema_editor):
+    """Fill the rollup from the orders placed before it existed (what rebuild_sales_rollup does).
+
+    Walks the history ``WINDOW_DAYS`` delivery dates at a time, like
+    ``analytics.rebuild``, so memory is bounded by one window's rows.
+    """
+    DailySales = apps.get_model('shop', 'DailySales')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    DailySales.objects.all().delete()
+    dates = OrderItem.objects.order_by('order__delivery_date').values_list('order__delivery_date', flat=True)
+    start, end = dates.first(), dates.reverse().first()
+    if start is None:
+        return
+
+    window = start
+    while window <= end:
+        window_end = min(window + timedelta(days=WINDOW_DAYS - 1), end)
+        rows = (
+            OrderItem.objects.filter(order__delivery_date__range=(window, window_end))
+            .values('order__delivery_date', 'product_id', 'order__delivery_method')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum(F('price') * F('quantity')),
+                orders=Count('order', distinct=True),
+            )
+            .order_by()
+        )
+        DailySales.objects.bulk_create([
+            DailySales(
+                date=row['order__delivery_date'], product_id=row['product_id'],
+                delivery_method=row['order__delivery_method'], quantity=row['total_quantity'],
+                revenue=row['total_revenue'], order_count=row['orders'],
+            )
+            for row in rows
+        ], batch_size=1000)
+        window = window_end + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0016_delivery_capacity'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
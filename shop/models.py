@@ -3,6 +3,8 @@ from django.urls import reverse
 from django.core.mail import send_mail
 from django.conf import settings
 
+from .images import ImageDerivatives
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -18,6 +20,10 @@ class Category(models.Model):
     def get_absolute_url(self):
         return reverse('shop:category_detail', args=[self.slug])
 
+    @property
+    def image_variants(self):
+        return ImageDerivatives(self.image)
+
 
 class Flavor(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -26,6 +32,31 @@ class Flavor(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    # Fields a product card needs; description stays out unless asked for
+    LISTING_FIELDS = [
+        'id', 'name', 'slug', 'price', 'image', 'weight', 'created',
+        'category__id', 'category__name', 'category__slug',
+    ]
+
+    def available(self):
+        return self.filter(available=True)
+
+    def for_listing(self, *extra_fields):
+        """Card-ready queryset: category joined, flavors prefetched, stable order."""
+        return (
+            self.select_related('category')
+            .prefetch_related(models.Prefetch('flavors', queryset=Flavor.objects.order_by('name')))
+            .only(*self.LISTING_FIELDS, *extra_fields)
+            .order_by('-created', '-id')
+        )
+
+    def with_flavor(self, flavor_id):
+        # Semi-join on the M2M table so a product is never returned twice
+        through = Product.flavors.through
+        return self.filter(pk__in=through.objects.filter(flavor_id=flavor_id).values('product_id'))
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
@@ -38,13 +69,28 @@ class Product(models.Model):
     available = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
     weight = models.CharField(max_length=50, blank=True, help_text="e.g. 1lbs, 500g, 2lb")
-    
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Storefront listing: available products, newest first
+            models.Index(fields=['-created', '-id'], condition=models.Q(available=True), name='product_listing_idx'),
+            models.Index(fields=['available', 'featured', '-created'], name='product_featured_idx'),
+            models.Index(fields=['available', 'category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['available', 'price'], name='product_price_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
         return reverse('shop:product_detail', args=[self.slug])
 
+    @property
+    def image_variants(self):
+        return ImageDerivatives(self.image)
+
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth.models import User
@@ -66,9 +112,18 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     created = models.DateTimeField(auto_now_add=True)
     paid = models.BooleanField(default=False)
-    
+
+    class Meta:
+        indexes = [
+            # OrderAdmin filters and date drill-down
+            models.Index(fields=['delivery_date', 'delivery_method'], name='order_delivery_idx'),
+            models.Index(fields=['-created'], name='order_created_idx'),
+            # OrderAdmin exact phone search
+            models.Index(fields=['phone'], name='order_phone_idx'),
+        ]
+
     def clean(self):
-        if self.delivery_date < timezone.now().date():
+        if self.delivery_date and self.delivery_date < timezone.now().date():
             raise ValidationError("Delivery date cannot be in the past.")
 
     
@@ -135,13 +190,21 @@ class CustomCakeRequest(models.Model):
     def __str__(self):
         return f"Custom Cake - {self.name} ({self.weight})"
 
+    @property
+    def design_image_variants(self):
+        return ImageDerivatives(self.design_image)
+
 
 class Review(models.Model):
     image = models.ImageField(upload_to='reviews/', help_text="Customer review screenshot")
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):  # ← FIXED INDENTATION
         return f"Review {self.id}"
+
+    @property
+    def image_variants(self):
+        return ImageDerivatives(self.image)
     
 # shop/models.py
 class FAQ(models.Model):
@@ -154,6 +217,7 @@ class FAQ(models.Model):
 
     class Meta:
         ordering = ['-is_answered', '-answered_at', '-asked_at']
+        indexes = [models.Index(fields=['-is_answered', '-answered_at', '-asked_at'], name='faq_answered_idx')]
 
     def __str__(self):
         return self.question[:50]    
@@ -172,7 +236,84 @@ class Feedback(models.Model):
 
     class Meta:
         ordering = ['-is_approved', '-created_at']
+        indexes = [models.Index(fields=['-is_approved', '-created_at'], name='feedback_approved_idx')]
 
     def __str__(self):
         return f"{self.name} - {self.rating} stars"    
-    
\ No newline at end of file
+
+    @property
+    def photo_variants(self):
+        return ImageDerivatives(self.photo)
+    
+# shop/models.py
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField(help_text="Comma-separated addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+    @property
+    def recipient_list(self):
+        return [address.strip() for address in self.recipients.split(',') if address.strip()]
+
+
+class DailySales(models.Model):
+    """Pre-aggregated order lines per delivery date, product and delivery method.
+
+    Maintained by ``shop.analytics.record_order`` as orders are placed and
+    rebuilt from history with ``manage.py rebuild_sales_rollup``.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    delivery_method = models.CharField(max_length=10, choices=Order.DELIVERY_CHOICES)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product', 'delivery_method'], name='dailysales_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.delivery_method}: {self.quantity}"
+
+
+class DeliveryCapacity(models.Model):
+    """Cakes bookable per delivery date; ``booked`` is the reservation counter.
+
+    Checkout and custom cake requests reserve with a conditional
+    ``UPDATE ... SET booked = booked + n`` (see ``shop.production.reserve``).
+    """
+    date = models.DateField(unique=True)
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Cakes for this date; empty uses DAILY_CAPACITY, 0 closes the date",
+    )
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'delivery capacity'
+
+    def __str__(self):
+        return f"{self.date}: {self.booked}/{self.capacity if self.capacity is not None else '-'}"
@@ -0,0 +1,84 @@
+# shop/orders.py
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .analytics import record_order, refresh_dates
+from .models import Order, OrderItem, Product
+from .production import recount_bookings, reserve
+
+DELIVERY_FEE = Decimal('100')
+
+
+def delivery_fee(delivery_method):
+    return DELIVERY_FEE if delivery_method == 'delivery' else Decimal('0')
+
+
+@dataclass
+class PlacedOrder:
+    order: Order
+    items: list
+    subtotal: Decimal
+    delivery_fee: Decimal
+
+
+def place_order(order, quantities):
+    """Save ``order`` and its items for a ``{slug: quantity}`` mapping in one transaction.
+
+    Products are locked and re-read in a single query so the order is priced
+    at current catalog prices, and all ``OrderItem`` rows are written with
+    one ``bulk_create``; the delivery date's capacity is reserved and the
+    sales rollup updated in the same transaction. Raises
+    ``ValidationError`` if nothing in the cart is still available or the
+    date is fully booked, leaving the database untouched.
+    """
+    with transaction.atomic():
+        products = (
+            Product.objects.select_for_update()
+            .filter(slug__in=quantities.keys(), available=True)
+            .only('id', 'slug', 'name', 'price')
+        )
+        by_slug = {product.slug: product for product in products}
+        lines = [(by_slug[slug], qty) for slug, qty in quantities.items() if slug in by_slug]
+        if not lines:
+            raise ValidationError("None of the items in your cart are available any more.")
+
+        reserve(order.delivery_date, sum(qty for _, qty in lines))
+
+        subtotal = sum((product.price * qty for product, qty in lines), Decimal('0'))
+        fee = delivery_fee(order.delivery_method)
+        order.total = subtotal + fee
+        order.save()
+
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=product.price, quantity=qty)
+            for product, qty in lines
+        ])
+        record_order(order, items)
+
+    return PlacedOrder(order=order, items=items, subtotal=subtotal, delivery_fee=fee)
+
+
+def orders_changed(days):
+    """Bring what is derived from the orders on ``days`` back in line after an edit or delete.
+
+    ``place_order`` keeps the capacity counters and the sales rollup up to
+    date incrementally; the admin and maintenance tools call this instead
+    when they change or remove existing orders, so deleted orders give
+    their delivery slots back.
+    """
+    days = {day for day in days if day is not None}
+    if days:
+        recount_bookings(days)
+        refresh_dates(days)
+
+
+def delete_orders(queryset):
+    """Delete ``queryset``'s orders and their lines; returns the number of orders deleted."""
+    with transaction.atomic():
+        days = set(queryset.values_list('delivery_date', flat=True).order_by().distinct())
+        _, deleted = queryset.delete()
+        orders_changed(days)
+    return deleted.get(Order._meta.label, 0)
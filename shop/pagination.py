@@ -0,0 +1,151 @@
+# shop/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+# sort key -> ordering fields; the last field must be unique (tie-breaker)
+SORTS = {
+    'newest': ('-created', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+    if not isinstance(values, list) or direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    # Cursors only ever carry value_to_string() output; nested JSON is forged
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+def estimate_count(queryset, cap=1000):
+    """Cheap row count: the planner's estimate on PostgreSQL, otherwise a count capped at ``cap``.
+
+    Returns ``(count, is_estimate)``.
+    """
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), True
+    capped = queryset.order_by().values('pk')[:cap + 1].count()
+    return min(capped, cap), capped > cap
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count=None, count_is_estimate=False):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_estimate = count_is_estimate
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """Seek pagination over ``ordering`` (e.g. ``('-created', '-id')``).
+
+    Pages are fetched with ``WHERE (key) < (cursor) ... LIMIT per_page + 1``,
+    so page 1000 costs the same index range read as page 1 and no
+    ``COUNT(*)`` is needed unless ``count_mode`` asks for one.
+    """
+
+    def __init__(self, queryset, per_page, ordering=SORTS['newest'], count_mode='estimate'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = ordering[0].startswith('-')
+        self.count_mode = count_mode
+
+    def _key(self, obj):
+        values = []
+        for name in self.fields:
+            field = self.queryset.model._meta.get_field(name)
+            values.append(field.value_to_string(obj))
+        return values
+
+    def _seek(self, values, forward):
+        # Row-value comparison spelled out as (a < x) OR (a = x AND b < y) for portability,
+        # plus a redundant a <= x so the planner can use it as an index range bound
+        after = forward != self.descending
+        op = 'gt' if after else 'lt'
+        model_meta = self.queryset.model._meta
+        values = [model_meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            clause = Q(**{f'{name}__{op}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{prev_name: prev_value})
+            condition |= clause
+        return Q(**{f'{self.fields[0]}__{op}e': values[0]}) & condition
+
+    def page(self, cursor=None):
+        forward, queryset = True, self.queryset
+        if cursor:
+            values, direction = decode_cursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            forward = direction == 'next'
+            try:
+                queryset = queryset.filter(self._seek(values, forward))
+            except (ValidationError, TypeError, ValueError) as e:
+                raise InvalidCursor(cursor) from e
+
+        ordering = self.ordering if forward else [
+            name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+        ]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            has_next, has_previous = True, has_more
+
+        count, is_estimate = None, False
+        if self.count_mode == 'exact':
+            count = self.queryset.count()
+        elif self.count_mode == 'estimate':
+            count, is_estimate = estimate_count(self.queryset)
+
+        return CursorPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=encode_cursor(self._key(rows[-1]), 'next') if rows and has_next else None,
+            previous_cursor=encode_cursor(self._key(rows[0]), 'prev') if rows and has_previous else None,
+            count=count,
+            count_is_estimate=is_estimate,
+        )
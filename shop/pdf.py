@@ -0,0 +1,98 @@
+# shop/pdf.py
+"""Just enough PDF to print a plain table: Helvetica text on A4 pages, no dependencies."""
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 40
+FONT_SIZE = 10
+LEADING = 15
+CELL_PADDING = 6  # points kept clear before the next column
+
+# Helvetica advance widths in 1/1000 em for ASCII 32-126 (standard AFM); anything else counts as 556
+_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+
+def _escape(text):
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _char_width(char, size):
+    code = ord(char)
+    return (_WIDTHS[code - 32] if 32 <= code < 127 else 556) * size / 1000
+
+
+def _clip(text, width, size=FONT_SIZE):
+    """``text`` shortened with "..." so it fits ``width`` points instead of running into the next column."""
+    text = str(text)
+    if sum(_char_width(char, size) for char in text) <= width:
+        return text
+    limit = width - 3 * _char_width('.', size)
+    used = 0
+    for i, char in enumerate(text):
+        used += _char_width(char, size)
+        if used > limit:
+            return text[:i].rstrip() + '...'
+    return text
+
+
+def _text(x, y, text, font='F1', size=FONT_SIZE):
+    return f'BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET'
+
+
+def table_pdf(title, header, rows, widths):
+    """Render ``rows`` under ``header`` as a PDF; ``widths`` are column widths in points.
+
+    Cells too long for their column are clipped rather than wrapped, so
+    every row stays one line.
+    """
+    xs = [MARGIN]
+    for width in widths[:-1]:
+        xs.append(xs[-1] + width)
+    per_page = (PAGE_HEIGHT - 2 * MARGIN - 2 * LEADING) // LEADING - 1
+
+    pages = []
+    chunks = [rows[i:i + per_page] for i in range(0, len(rows), per_page)] or [[]]
+    for number, chunk in enumerate(chunks, 1):
+        y = PAGE_HEIGHT - MARGIN
+        ops = [_text(MARGIN, y, title, 'F2', 14),
+               _text(PAGE_WIDTH - MARGIN - 60, y, f'Page {number}/{len(chunks)}')]
+        y -= 2 * LEADING
+        ops += [_text(x, y, _clip(cell, width - CELL_PADDING), 'F2') for x, width, cell in zip(xs, widths, header)]
+        ops.append(f'{MARGIN} {y - 4} m {PAGE_WIDTH - MARGIN} {y - 4} l S')
+        for row in chunk:
+            y -= LEADING
+            ops += [_text(x, y, _clip(cell, width - CELL_PADDING)) for x, width, cell in zip(xs, widths, row) if cell != '']
+        pages.append('\n'.join(ops).encode('latin-1'))
+
+    # Objects: 1 catalog, 2 page tree, 3-4 fonts, then a page and its content per page
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            ' '.join(f'{5 + 2 * i} 0 R' for i in range(len(pages))), len(pages))).encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    for i, content in enumerate(pages):
+        objects.append((
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {6 + 2 * i} 0 R >>'
+        ).encode())
+        objects.append(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
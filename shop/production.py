@@ -0,0 +1,200 @@
+# shop/production.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CustomCakeRequest, DeliveryCapacity, OrderItem
+
+BOOKING_HORIZON_DAYS = getattr(settings, 'BOOKING_HORIZON_DAYS', 60)
+
+
+# === BAKE LIST ===
+def bake_list(start, end):
+    """Cakes to bake per delivery date, summed per item, flavor and weight.
+
+    One grouped query over order lines and one over custom requests; catalog
+    products are their own flavor, so that column is only set for custom
+    cakes. Rows are dicts sorted by date, then item.
+    """
+    ordered = (
+        OrderItem.objects.filter(order__delivery_date__range=(start, end))
+        .values('order__delivery_date', 'product__name', 'product__weight')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    custom = (
+        CustomCakeRequest.objects.filter(delivery_date__range=(start, end))
+        .values('delivery_date', 'flavor', 'weight')
+        .annotate(quantity=Count('id'))
+        .order_by()
+    )
+    rows = [
+        {'date': row['order__delivery_date'], 'kind': 'Order', 'item': row['product__name'],
+         'flavor': '', 'weight': row['product__weight'], 'quantity': row['quantity']}
+        for row in ordered
+    ] + [
+        {'date': row['delivery_date'], 'kind': 'Custom', 'item': 'Custom cake',
+         'flavor': row['flavor'], 'weight': row['weight'], 'quantity': row['quantity']}
+        for row in custom
+    ]
+    rows.sort(key=lambda row: (row['date'], row['kind'] != 'Order', row['item'], row['flavor'], row['weight']))
+    return rows
+
+
+# === CAPACITY ===
+def daily_capacity():
+    """Cakes the kitchen can make per delivery date; ``None`` means unlimited."""
+    return getattr(settings, 'DAILY_CAPACITY', None)
+
+
+def day_capacities(start, end):
+    """``{date: (capacity, booked)}`` for ``start``..``end`` from one query.
+
+    A date's own capacity wins (0 means closed); dates without one use
+    DAILY_CAPACITY. ``booked`` is ``None`` for dates without a counter yet.
+    """
+    rows = {
+        day: (capacity, booked)
+        for day, capacity, booked in DeliveryCapacity.objects.filter(date__range=(start, end))
+        .values_list('date', 'capacity', 'booked')
+    }
+    default = daily_capacity()
+    capacities = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        capacity, booked = rows.get(day, (None, None))
+        capacities[day] = (default if capacity is None else capacity, booked)
+    return capacities
+
+
+def _has_room(quantity):
+    """Rows with space for ``quantity`` more cakes; a NULL capacity falls back to DAILY_CAPACITY."""
+    default = daily_capacity()
+    if default is None:
+        return Q(capacity__isnull=True) | Q(booked__lte=F('capacity') - quantity)
+    return Q(booked__lte=Coalesce('capacity', Value(default)) - quantity)
+
+
+def _fully_booked(day):
+    return ValidationError(
+        "We are fully booked for %(day)s. Please choose another date.",
+        params={'day': day.strftime('%d %B')}, code='fully_booked',
+    )
+
+
+def booked_counts(start, end):
+    """``{date: cakes}`` already ordered or requested, counted from the orders themselves."""
+    counts = {}
+    ordered = (
+        OrderItem.objects.filter(order__delivery_date__range=(start, end))
+        .values_list('order__delivery_date').annotate(total=Sum('quantity')).order_by()
+    )
+    custom = (
+        CustomCakeRequest.objects.filter(delivery_date__range=(start, end))
+        .values_list('delivery_date').annotate(total=Count('id')).order_by()
+    )
+    for day, total in [*ordered, *custom]:
+        counts[day] = counts.get(day, 0) + total
+    return counts
+
+
+def sync_capacity(start, end, recount=False):
+    """Create the ``DeliveryCapacity`` rows for ``start``..``end`` that do not exist yet.
+
+    New rows start from the current bookings. With ``recount`` existing
+    rows have ``booked`` overwritten from the orders too (see ``recount_bookings``).
+    Returns the rows written.
+    """
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    if recount:
+        return recount_bookings(days)
+    counts = booked_counts(start, end)
+    existing = set(DeliveryCapacity.objects.filter(date__range=(start, end)).values_list('date', flat=True))
+    rows = DeliveryCapacity.objects.bulk_create(
+        [DeliveryCapacity(date=day, booked=counts.get(day, 0)) for day in days if day not in existing],
+        ignore_conflicts=True,
+    )
+    return len(rows)
+
+
+def recount_bookings(days):
+    """Reset ``booked`` for ``days`` from the orders and custom requests that are left.
+
+    For edits and deletions, which ``reserve`` never sees. The counters are
+    locked before counting, so a checkout reserving meanwhile waits and is
+    counted instead of being overwritten. Returns the rows written.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    with transaction.atomic():
+        list(DeliveryCapacity.objects.select_for_update().filter(date__in=days).values_list('pk', flat=True))
+        counts = booked_counts(days[0], days[-1])
+        rows = DeliveryCapacity.objects.bulk_create(
+            [DeliveryCapacity(date=day, booked=counts.get(day, 0)) for day in days],
+            update_conflicts=True, unique_fields=['date'], update_fields=['booked'],
+        )
+    return len(rows)
+
+
+def reserve(day, quantity):
+    """Book ``quantity`` cakes on ``day`` or raise ``ValidationError``.
+
+    Call inside the transaction that saves the booking. The check and the
+    increment are one conditional UPDATE, so concurrent checkouts cannot
+    both take the last slot: the row lock makes the second one re-check
+    against the first one's count.
+    """
+    def take():
+        return DeliveryCapacity.objects.filter(_has_room(quantity), date=day).update(booked=F('booked') + quantity)
+
+    if take():
+        return
+    if not DeliveryCapacity.objects.filter(date=day).exists():
+        # First booking for a date past the precomputed range
+        sync_capacity(day, day)
+        if take():
+            return
+    raise _fully_booked(day)
+
+
+def check_capacity(day, quantity):
+    """Form-time check against the date's counter; ``reserve`` makes the binding one."""
+    if day is None:
+        return
+    row = DeliveryCapacity.objects.filter(date=day).values_list('capacity', 'booked').first()
+    capacity, booked = row or (None, None)
+    if capacity is None:
+        capacity = daily_capacity()
+    if capacity is None:
+        return
+    if booked is None:
+        booked = booked_counts(day, day).get(day, 0)
+    if booked + quantity > capacity:
+        raise _fully_booked(day)
+
+
+def available_dates(count, quantity=1, start=None, horizon=BOOKING_HORIZON_DAYS):
+    """The next ``count`` delivery dates with room for ``quantity`` cakes, from one query.
+
+    Dates without a row are treated as empty; ``sync_delivery_capacity``
+    keeps rows precomputed over the booking horizon.
+    """
+    start = start or timezone.localdate()
+    end = start + timedelta(days=horizon - 1)
+    full = set(
+        DeliveryCapacity.objects.filter(date__range=(start, end)).exclude(_has_room(quantity))
+        .values_list('date', flat=True)
+    )
+    dates = []
+    day = start
+    while day <= end and len(dates) < count:
+        if day not in full:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
@@ -0,0 +1,38 @@
+# shop/routers.py
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read-mostly storefront tables that are safe to serve slightly stale
+CATALOG_MODELS = {
+    'shop.category',
+    'shop.product',
+    'shop.flavor',
+    'shop.product_flavors',
+}
+
+
+class CatalogReplicaRouter:
+    """Send catalog reads to ``settings.CATALOG_READ_ALIAS``; everything else stays on the primary.
+
+    Reads made inside a transaction on the primary (``select_for_update`` in
+    checkout, admin saves) stay there so they see their own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = getattr(settings, 'CATALOG_READ_ALIAS', None)
+        if not alias or model._meta.label_lower not in CATALOG_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == DEFAULT_DB_ALIAS
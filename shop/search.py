@@ -0,0 +1,183 @@
+# shop/search.py
+import difflib
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+SEARCH_MAX_RESULTS = getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+FTS_TABLE = 'shop_product_fts'
+FTS_VOCAB_TABLE = 'shop_product_fts_vocab'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return [word.lower() for word in WORD_RE.findall(query or '')]
+
+
+def order_by_ids(queryset, ids):
+    """Restrict ``queryset`` to ``ids`` and keep them in the given (ranked) order."""
+    if not ids:
+        return queryset.none()
+    # Written as raw SQL: compiling hundreds of When() objects costs more than the query
+    column = '%s.%s' % (
+        connection.ops.quote_name(queryset.model._meta.db_table),
+        connection.ops.quote_name(queryset.model._meta.pk.column),
+    )
+    whens = ' '.join(f'WHEN {int(pk)} THEN {pos}' for pos, pk in enumerate(ids))
+    return queryset.filter(pk__in=ids).order_by(RawSQL(f'CASE {column} {whens} END', []))
+
+
+class BasicSearchBackend:
+    """The original ``icontains`` scan; used where no full-text engine is available."""
+
+    def search(self, queryset, query):
+        words = tokenize(query)
+        for word in words:
+            queryset = queryset.filter(Q(name__icontains=word) | Q(description__icontains=word))
+        return queryset
+
+    def index(self, product):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    """SQLite FTS5 table ranked with bm25 (name weighted over description).
+
+    Every word is matched as a prefix; if nothing matches, misspelt words are
+    replaced by their closest terms from the index vocabulary and retried.
+    Only rows of the (already filtered) queryset are ranked, so the
+    ``SEARCH_MAX_RESULTS`` cap applies after category/flavor/price filters.
+    """
+
+    NAME_WEIGHT = 10.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def search(self, queryset, query):
+        words = tokenize(query)
+        if not words:
+            return queryset
+        ids = self._match(words, queryset)
+        if not ids:
+            corrected = self._correct(words)
+            if corrected != words:
+                ids = self._match(corrected, queryset)
+        return order_by_ids(queryset, ids)
+
+    def _match(self, words, queryset):
+        expression = ' '.join(f'"{word}"*' for word in words)
+        candidates, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({candidates}) "
+                f"ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s",
+                [expression, *params, self.NAME_WEIGHT, self.DESCRIPTION_WEIGHT, SEARCH_MAX_RESULTS],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _correct(self, words):
+        corrected = []
+        with connection.cursor() as cursor:
+            for word in words:
+                # Only consider terms sharing the first letter to keep the scan small
+                cursor.execute(
+                    f"SELECT term FROM {FTS_VOCAB_TABLE} WHERE term >= %s AND term < %s",
+                    [word[0], chr(ord(word[0]) + 1)],
+                )
+                terms = [row[0] for row in cursor.fetchall()]
+                if any(term.startswith(word) for term in terms):
+                    corrected.append(word)
+                    continue
+                matches = difflib.get_close_matches(word, terms, n=1, cutoff=0.75)
+                corrected.append(matches[0] if matches else word)
+        return corrected
+
+    def index(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+                [product.pk, product.name, product.description],
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                f"SELECT id, name, description FROM {Product._meta.db_table}"
+            )
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """PostgreSQL full-text search over the ``product_search_idx`` GIN expression index.
+
+    Falls back to pg_trgm word similarity on the name for misspellings.
+    Ranking runs on the queryset it is given, so callers filter first.
+    """
+
+    TRIGRAM_THRESHOLD = 0.3
+
+    @staticmethod
+    def vector():
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('name', weight='A', config='simple')
+            + SearchVector('description', weight='B', config='simple')
+        )
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+        words = tokenize(query)
+        if not words:
+            return queryset
+        search_query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config='simple')
+        vector = self.vector()
+        ids = list(
+            queryset.annotate(search=vector, rank=SearchRank(vector, search_query))
+            .filter(search=search_query)
+            .order_by('-rank')
+            .values_list('pk', flat=True)[:SEARCH_MAX_RESULTS]
+        )
+        if not ids:
+            ids = list(
+                queryset.annotate(similarity=TrigramWordSimilarity(' '.join(words), 'name'))
+                .filter(similarity__gte=self.TRIGRAM_THRESHOLD)
+                .order_by('-similarity')
+                .values_list('pk', flat=True)[:SEARCH_MAX_RESULTS]
+            )
+        return order_by_ids(queryset, ids)
+
+
+BACKENDS = {
+    'sqlite': 'shop.search.SQLiteFTSBackend',
+    'postgresql': 'shop.search.PostgresSearchBackend',
+}
+
+
+def get_search_backend():
+    """Backend from ``settings.SEARCH_BACKEND``, or picked from the database vendor."""
+    path = getattr(settings, 'SEARCH_BACKEND', None) or BACKENDS.get(connection.vendor, 'shop.search.BasicSearchBackend')
+    return import_string(path)()
+
+
+def search_products(queryset, query):
+    return get_search_backend().search(queryset, query)
@@ -0,0 +1,94 @@
+# shop/signals.py
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .cache import bump_catalog_version, invalidate_flavor_menu, invalidate_home
+from .images import IMAGE_ERRORS, IMAGE_FIELDS, generate_derivatives
+from .models import FAQ, Category, CustomCakeRequest, Feedback, Flavor, Product, Review
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+# Which cached home page sections each model feeds
+HOME_DEPENDENCIES = {
+    Product: ['featured', 'categories'],
+    Category: ['categories'],
+    Review: ['reviews'],
+    FAQ: ['faqs'],
+    Feedback: ['feedbacks'],
+}
+
+
+def invalidate_home_sections(sender, **kwargs):
+    invalidate_home(*HOME_DEPENDENCIES[sender])
+
+
+for model in HOME_DEPENDENCIES:
+    post_save.connect(invalidate_home_sections, sender=model, dispatch_uid=f'home-{model.__name__}-save')
+    post_delete.connect(invalidate_home_sections, sender=model, dispatch_uid=f'home-{model.__name__}-delete')
+
+
+def invalidate_flavors(sender, **kwargs):
+    invalidate_flavor_menu()
+
+
+post_save.connect(invalidate_flavors, sender=Flavor, dispatch_uid='flavor-menu-save')
+post_delete.connect(invalidate_flavors, sender=Flavor, dispatch_uid='flavor-menu-delete')
+
+
+def bump_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+for model in [Product, Category, Flavor]:
+    post_save.connect(bump_catalog, sender=model, dispatch_uid=f'catalog-{model.__name__}-save')
+    post_delete.connect(bump_catalog, sender=model, dispatch_uid=f'catalog-{model.__name__}-delete')
+m2m_changed.connect(bump_catalog, sender=Product.flavors.through, dispatch_uid='catalog-product-flavors')
+
+
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+post_save.connect(index_product, sender=Product, dispatch_uid='product-search-save')
+post_delete.connect(unindex_product, sender=Product, dispatch_uid='product-search-delete')
+
+
+def make_image_derivatives(sender, instance, **kwargs):
+    # Customer uploads are not resized in the customer's request: feedback photos
+    # when staff approve them (they are not shown before), custom cake designs
+    # (admin only) by the generate_image_derivatives backfill
+    if sender is CustomCakeRequest or (sender is Feedback and not instance.is_approved):
+        return
+    fieldfile = getattr(instance, IMAGE_FIELD_BY_MODEL[sender])
+    if not fieldfile:
+        return
+    try:
+        generate_derivatives(fieldfile.name, fieldfile.storage)
+    except IMAGE_ERRORS:
+        # A broken upload must not fail the save; the original is still served
+        logger.warning("Could not create derivatives for %s", fieldfile.name, exc_info=True)
+
+
+IMAGE_FIELD_BY_MODEL = {apps.get_model(label): field for label, field in IMAGE_FIELDS}
+for model in IMAGE_FIELD_BY_MODEL:
+    post_save.connect(make_image_derivatives, sender=model, dispatch_uid=f'images-{model.__name__}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Straight on the sqlite3 connection: setup, not queries the app made
+    for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='sqlite-pragmas')
@@ -0,0 +1,12 @@
+# shop/templatetags/shop_images.py
+from django import template
+
+from shop.images import ImageDerivatives
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(fieldfile, fmt='jpeg'):
+    """``srcset`` value for an image field: ``{% srcset product.image 'webp' %}``."""
+    return ImageDerivatives(fieldfile).srcset(fmt)
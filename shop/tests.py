@@ -1,3 +1,1424 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+import unittest
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router, transaction
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .analytics import production_schedule, revenue_trend
+from .cache import get_cache_stats, get_flavor_menu, invalidate_flavor_menu
+from .context_processors import global_context
+from .exports import CHUNK_SIZE
+from . import images
+from .images import derivative_name
+from .loadtest import summarize
+from .mail import queue_mail
+from .metrics import registry
+from .models import FAQ, Category, CustomCakeRequest, DailySales, DeliveryCapacity, Feedback, Flavor, Order, OrderItem, OutboundEmail, Product, Review
+from .orders import place_order
+from .pagination import KeysetPaginator, encode_cursor
+from .production import available_dates, bake_list, sync_capacity
+from .search import get_search_backend, search_products
+
+
+def setUpModule():
+    # Fixtures point at products/test.jpg; give them a real (tiny) image in a
+    # throwaway MEDIA_ROOT so derivatives work and nothing lands in media/
+    media_root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(media_root, 'products'))
+    Image.new('RGB', (8, 8), 'brown').save(os.path.join(media_root, 'products', 'test.jpg'), 'JPEG')
+    override = override_settings(MEDIA_ROOT=media_root)
+    override.enable()
+    unittest.addModuleCleanup(shutil.rmtree, media_root)
+    unittest.addModuleCleanup(override.disable)
+
+
+def make_products(count, category=None, prefix='cake', image='products/test.jpg', **kwargs):
+    category = category or Category.objects.create(name='Cakes', slug='cakes')
+    return [
+        Product.objects.create(
+            name=f"{prefix.title()} {i}",
+            slug=f"{prefix}-{i}",
+            category=category,
+            description="Test cake",
+            price=Decimal('100.00') + i,
+            image=image,
+            **kwargs,
+        )
+        for i in range(count)
+    ]
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.products = make_products(20)
+
+    def fill_cart(self, products):
+        session = self.client.session
+        session['cart'] = {product.slug: 2 for product in products}
+        session.save()
+
+    def count_cart_queries(self):
+        get_flavor_menu()  # keep the memoized menu out of the count
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('shop:cart'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_cart_page_query_count_is_constant(self):
+        self.fill_cart(self.products[:1])
+        one_item = self.count_cart_queries()
+        self.fill_cart(self.products)
+        twenty_items = self.count_cart_queries()
+        self.assertEqual(one_item, twenty_items)
+
+    def test_cart_totals(self):
+        self.fill_cart(self.products[:2])
+        response = self.client.get(reverse('shop:cart'))
+        self.assertEqual(len(response.context['cart_items']), 2)
+        self.assertEqual(response.context['total'], Decimal('402.00'))
+
+    def test_stale_slugs_are_pruned(self):
+        self.fill_cart(self.products[:2])
+        self.products[0].available = False
+        self.products[0].save()
+        session = self.client.session
+        session['cart']['deleted-cake'] = 1
+        session.save()
+
+        response = self.client.get(reverse('shop:cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['product'] for i in response.context['cart_items']], [self.products[1]])
+        self.assertEqual(self.client.session['cart'], {self.products[1].slug: 2})
+
+    def test_add_update_remove(self):
+        slug = self.products[0].slug
+        response = self.client.post(reverse('shop:add_to_cart', args=[slug]), {'quantity': 3})
+        self.assertEqual(response.json()['cart_count'], 3)
+        self.client.post(reverse('shop:update_cart', args=[slug]), {'quantity': 5})
+        self.assertEqual(self.client.session['cart'], {slug: 5})
+        self.client.get(reverse('shop:remove_from_cart', args=[slug]))
+        self.assertEqual(self.client.session['cart'], {})
+
+    def test_bad_quantities_are_refused_or_capped(self):
+        slug = self.products[0].slug
+        url = reverse('shop:add_to_cart', args=[slug])
+        for quantity in [-5, 0, 'lots']:
+            self.assertEqual(self.client.post(url, {'quantity': quantity}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'quantity': 10 ** 20}).json()['cart_count'], 99)
+        self.client.post(reverse('shop:update_cart', args=[slug]), {'quantity': 10 ** 20})
+        self.assertEqual(self.client.session['cart'], {slug: 99})
+
+    @override_settings(CART_STORAGE='shop.cart.CacheCartStorage')
+    def test_stored_bad_quantities_are_dropped(self):
+        slug = self.products[0].slug
+        self.client.post(reverse('shop:add_to_cart', args=[slug]))
+        cart_id = signing.get_cookie_signer(salt='cart' + 'shop.cart.id').unsign(self.client.cookies['cart'].value)
+        cache.set(f'cart:{cart_id}', {slug: -5, self.products[1].slug: 2})
+        response = self.client.post(reverse('shop:add_to_cart', args=[slug]), {'quantity': 1})
+        self.assertEqual(response.json()['cart_count'], 3)
+
+
+
+class CartStorageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = make_products(2)
+        self.slug = self.products[0].slug
+
+    def round_trip(self):
+        self.client.post(reverse('shop:add_to_cart', args=[self.slug]), {'quantity': 2})
+        self.client.post(reverse('shop:add_to_cart', args=[self.products[1].slug]))
+        self.client.post(reverse('shop:update_cart', args=[self.slug]), {'quantity': 4})
+        response = self.client.get(reverse('shop:cart'))
+        self.assertEqual(response.context['total'], Decimal('501.00'))
+        self.assertContains(response, 'items in cart')
+
+    @override_settings(CART_STORAGE='shop.cart.CacheCartStorage')
+    def test_cache_storage_skips_session_writes(self):
+        self.round_trip()
+        self.assertEqual(Session.objects.count(), 0)
+
+    @override_settings(CART_STORAGE='shop.cart.SignedCookieCartStorage')
+    def test_cookie_storage_skips_session_writes(self):
+        self.round_trip()
+        self.assertEqual(Session.objects.count(), 0)
+        self.client.get(reverse('shop:remove_from_cart', args=[self.slug]))
+        self.client.get(reverse('shop:remove_from_cart', args=[self.products[1].slug]))
+        self.assertEqual(self.client.cookies['cart'].value, '')
+
+    @override_settings(CART_STORAGE='shop.cart.SignedCookieCartStorage')
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies['cart'] = 'eyJjYWtlLTAiOjk5fQ:forged'
+        response = self.client.get(reverse('shop:cart'))
+        self.assertEqual(response.context['cart_items'], [])
+
+
+
+class CartBatchApiTests(TestCase):
+    def setUp(self):
+        self.products = make_products(5)
+        self.url = reverse('shop:add_to_cart_batch')
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_adds_all_items_with_one_product_query(self):
+        self.client.post(reverse('shop:add_to_cart', args=[self.products[0].slug]))
+        items = [{'slug': product.slug, 'quantity': 2} for product in self.products]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({'items': items + [{'slug': 'gone', 'quantity': 1}]})
+        product_queries = [q for q in ctx.captured_queries if 'shop_product' in q['sql']]
+        self.assertEqual(len(product_queries), 1)
+
+        data = response.json()
+        self.assertEqual(data['unavailable'], ['gone'])
+        self.assertEqual(data['cart']['count'], 11)
+        self.assertEqual(data['cart']['lines'], 5)
+        self.assertEqual(data['cart']['items'][0], {
+            'slug': 'cake-0', 'name': 'Cake 0', 'url': self.products[0].get_absolute_url(),
+            'price': '100.00', 'quantity': 3, 'subtotal': '300.00',
+        })
+        self.assertEqual(data['cart']['total'], '1120.00')
+
+    def test_rejects_malformed_payloads(self):
+        for payload in [{}, {'items': []}, {'items': [{'slug': 'cake-0', 'quantity': 0}]},
+                        {'items': [{'slug': 'cake-0', 'quantity': '2'}]},
+                        {'items': [{'slug': 'cake-0', 'quantity': 100}]},
+                        {'items': [{'slug': 'cake-0', 'quantity': 10 ** 20}]}]:
+            self.assertEqual(self.post(payload).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.products = make_products(5)
+
+    def new_order(self, method='pickup'):
+        return Order(name='Test', phone='017', delivery_method=method,
+                     delivery_date=date.today() + timedelta(days=1))
+
+    def test_items_are_bulk_inserted(self):
+        quantities = {product.slug: 2 for product in self.products}
+        tomorrow = date.today() + timedelta(days=1)
+        sync_capacity(tomorrow, tomorrow)
+        # SAVEPOINT + product lookup + capacity reservation + order insert + one bulk insert
+        # + rollup upsert + RELEASE
+        with self.assertNumQueries(7):
+            placed = place_order(self.new_order('delivery'), quantities)
+        self.assertEqual(placed.order.items.count(), 5)
+        self.assertEqual(placed.order.total, placed.subtotal + 100)
+
+    def test_unavailable_cart_leaves_no_order(self):
+        Product.objects.update(available=False)
+        with self.assertRaises(ValidationError):
+            place_order(self.new_order(), {self.products[0].slug: 1})
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_post_places_order(self):
+        session = self.client.session
+        session['cart'] = {self.products[0].slug: 3}
+        session.save()
+        response = self.client.post(reverse('shop:checkout'), {
+            'name': 'Test', 'phone': '017', 'delivery_method': 'pickup',
+            'delivery_date': date.today() + timedelta(days=1),
+        })
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('shop:order_success', args=[order.id]))
+        self.assertEqual(order.total, Decimal('300.00'))
+        self.assertEqual(self.client.session['cart'], {})
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("SMTP down")
+
+
+class OutboxTests(TestCase):
+    def test_views_queue_instead_of_sending(self):
+        self.client.post(reverse('shop:contact'), {'name': 'A', 'email': 'a@example.com', 'message': 'Hi'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().recipient_list, ['contact@arkitchen.com'])
+
+    def test_long_subject_is_truncated(self):
+        self.client.post(reverse('shop:contact'), {'name': 'A' * 400, 'email': 'a@example.com', 'message': 'Hi'})
+        self.assertEqual(len(OutboundEmail.objects.get().subject), 255)
+
+    def test_worker_count_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            call_command('send_queued_mail', workers=0, stdout=StringIO())
+
+    def test_worker_sends_pending_mail(self):
+        for i in range(3):
+            queue_mail(f"Subject {i}", "Body", None, ['a@example.com', 'b@example.com'])
+        call_command('send_queued_mail', workers=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['a@example.com', 'b@example.com'])
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+    @override_settings(PERF_METRICS=True)
+    def test_worker_reports_smtp_time(self):
+        queue_mail("Subject", "Body", None, ['a@example.com'])
+        out = StringIO()
+        call_command('send_queued_mail', stdout=out)
+        self.assertRegex(out.getvalue(), r'Sent 1, failed 0 \([\d.]+s SMTP\)')
+
+    @override_settings(EMAIL_BACKEND='shop.tests.FailingBackend')
+    def test_failed_mail_is_retried_later(self):
+        email = queue_mail("Subject", "Body", None, ['a@example.com'])
+        call_command('send_queued_mail', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTP down', email.last_error)
+        self.assertGreater(email.next_attempt_at, email.created)
+
+
+class HomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_flavor_menu()
+        self.products = make_products(3, featured=True)
+        Review.objects.bulk_create([Review(image=f'reviews/{i}.jpg') for i in range(20)])  # no files to resize
+
+    def test_warm_home_page_skips_catalog_queries(self):
+        self.client.get(reverse('shop:home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('shop:home'))
+        self.assertEqual(len(response.context['featured_products']), 3)
+        self.assertEqual(response.context['categories'][0].product_count, 3)
+
+    def test_review_carousel_is_bounded(self):
+        response = self.client.get(reverse('shop:home'))
+        slides = response.context['slides']
+        self.assertEqual(sum(len(slide) for slide in slides), 12)
+
+    def test_sections_invalidated_on_save(self):
+        self.client.get(reverse('shop:home'))
+        FAQ.objects.create(question='Eggless?', answer='Yes', is_answered=True)
+        self.products[0].featured = False
+        self.products[0].save()
+        response = self.client.get(reverse('shop:home'))
+        self.assertEqual(len(response.context['faqs']), 1)
+        self.assertEqual(len(response.context['featured_products']), 2)
+
+
+class FlavorMenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_flavor_menu()
+        self.chocolate = Flavor.objects.create(name='Chocolate')
+
+    def test_context_is_lazy(self):
+        with self.assertNumQueries(0):
+            context = global_context(None)
+        with self.assertNumQueries(1):
+            self.assertEqual([f.name for f in context['flavors']], ['Chocolate'])
+
+    def test_menu_is_memoized(self):
+        get_flavor_menu()
+        with self.assertNumQueries(0):
+            menu = get_flavor_menu()
+        self.assertEqual(menu, ((self.chocolate.id, 'Chocolate'),))
+
+    def test_invalidated_on_save_and_delete(self):
+        get_flavor_menu()
+        vanilla = Flavor.objects.create(name='Vanilla')
+        self.assertEqual(len(get_flavor_menu()), 2)
+        vanilla.delete()
+        self.assertEqual(len(get_flavor_menu()), 1)
+
+
+class ListingQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_flavor_menu()
+        self.flavors = [Flavor.objects.create(name=name) for name in ['Chocolate', 'Vanilla']]
+        self.products = make_products(12, featured=True)
+        for product in self.products:
+            product.flavors.set(self.flavors)
+        get_flavor_menu()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_listing_pages_have_constant_query_count(self):
+        urls = [
+            reverse('shop:shop'),
+            reverse('shop:shop') + f'?flavor={self.flavors[0].id}',
+            reverse('shop:category_detail', args=['cakes']),
+            reverse('shop:offers'),
+        ]
+        before = [self.count_queries(url) for url in urls]
+        for product in make_products(12, category=self.products[0].category, prefix='more', featured=True):
+            product.flavors.set(self.flavors)
+        self.assertEqual(before, [self.count_queries(url) for url in urls])
+
+    def test_flavor_filter_has_no_duplicates(self):
+        response = self.client.get(reverse('shop:shop') + f'?flavor={self.flavors[0].id}')
+        names = [product.name for product in response.context['products']]
+        self.assertEqual(len(names), len(set(names)))
+
+
+@skipUnless(connection.vendor == 'sqlite', "Plans are checked against SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """Storefront and admin queries must be served from an index, never a full table scan."""
+
+    def assertNoTableScan(self, queryset):
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        scans = [line for line in plan.splitlines() if line.strip().endswith(f'SCAN {table}')]
+        self.assertFalse(scans, f"Full scan of {table}:\n{plan}")
+
+    def test_product_queries(self):
+        products = Product.objects.available()
+        self.assertNoTableScan(products.for_listing())
+        self.assertNoTableScan(products.filter(featured=True).for_listing())
+        self.assertNoTableScan(products.filter(category__slug='cakes').for_listing())
+        self.assertNoTableScan(products.filter(price__gte=100, price__lte=500).for_listing())
+        self.assertNoTableScan(products.with_flavor(1).for_listing())
+
+    def test_home_sections(self):
+        self.assertNoTableScan(Review.objects.order_by('-created')[:12])
+        self.assertNoTableScan(FAQ.objects.filter(is_answered=True))
+        self.assertNoTableScan(Feedback.objects.filter(is_approved=True)[:6])
+
+    def test_order_admin_filters(self):
+        today = date.today()
+        self.assertNoTableScan(Order.objects.filter(delivery_date=today))
+        self.assertNoTableScan(Order.objects.filter(delivery_date__gte=today, delivery_method='pickup'))
+        self.assertNoTableScan(Order.objects.filter(created__gte=timezone.now() - timedelta(days=7)))
+
+
+@skipUnless(connection.vendor == 'sqlite', "Exercises the SQLite FTS5 backend")
+class SearchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Cakes', slug='cakes')
+        self.truffle = Product.objects.create(
+            name='Chocolate Truffle', slug='truffle', category=category, price=900, image='products/test.jpg',
+            description='Layers of dark ganache',
+        )
+        self.vanilla = Product.objects.create(
+            name='Vanilla Dream', slug='vanilla', category=category, price=700, image='products/test.jpg',
+            description='Vanilla sponge with chocolate shavings',
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.available(), query))
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('chocolate'), [self.truffle, self.vanilla])
+
+    def test_prefix_and_typo_fallback(self):
+        self.assertEqual(self.search('truf'), [self.truffle])
+        self.assertEqual(self.search('vanila'), [self.vanilla])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.vanilla.name = 'Mango Dream'
+        self.vanilla.save()
+        self.assertEqual(self.search('mango'), [self.vanilla])
+        self.vanilla.delete()
+        self.assertEqual(self.search('dream'), [])
+
+    def test_filters_apply_before_the_result_cap(self):
+        # Better-ranked matches in another category must not crowd out the filtered ones.
+        other = Category.objects.create(name='Other', slug='other')
+        make_products(5, category=other, prefix='chocolate')
+        with mock.patch('shop.search.SEARCH_MAX_RESULTS', 3):
+            response = self.client.get(reverse('shop:shop'), {'q': 'chocolate', 'category': 'cakes'})
+        self.assertEqual(list(response.context['products']), [self.truffle, self.vanilla])
+
+    def test_shop_view_uses_search(self):
+        response = self.client.get(reverse('shop:shop'), {'q': 'ganache'})
+        self.assertEqual(list(response.context['products']), [self.truffle])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.products = make_products(25)
+        # Equal prices exercise the id tie-breaker
+        Product.objects.filter(slug__in=['cake-3', 'cake-4', 'cake-5']).update(price=500)
+
+    def walk(self, ordering):
+        paginator = KeysetPaginator(Product.objects.available().for_listing(), 9, ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(paginator.page(back[-1].previous_cursor))
+        return pages, back
+
+    def test_pages_cover_listing_in_order(self):
+        for ordering in [('-created', '-id'), ('price', 'id'), ('-price', '-id')]:
+            pages, back = self.walk(ordering)
+            expected = list(Product.objects.order_by(*ordering))
+            self.assertEqual([p for page in pages for p in page], expected)
+            self.assertEqual([len(page) for page in pages], [9, 9, 7])
+            self.assertEqual([list(page) for page in reversed(back)], [list(page) for page in pages])
+
+    def test_shop_view_cursor_links(self):
+        response = self.client.get(reverse('shop:shop'), {'sort': 'price'})
+        page = response.context['products']
+        self.assertEqual(response.context['total_count'], 25)
+        self.assertContains(response, f'cursor={page.next_cursor}')
+        response = self.client.get(reverse('shop:shop'), {'sort': 'price', 'cursor': page.next_cursor})
+        self.assertEqual(response.context['products'].object_list[0], Product.objects.order_by('price', 'id')[9])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('shop:shop'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['products'].has_previous)
+
+    def test_forged_cursor_values_fall_back_to_first_page(self):
+        for values in [[[1], 1], [1, 1], [{'a': 1}, 1]]:
+            cursor = encode_cursor(values, 'next')
+            response = self.client.get(reverse('shop:shop'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.context['products'].has_previous)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.category = Category.objects.create(name='Cakes', slug='cakes')
+
+    def upload(self, name='cake.jpg', size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'brown').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_creates_all_sizes(self):
+        product = Product.objects.create(name='Cake', slug='cake', category=self.category,
+                                         description='', price=500, image=self.upload())
+        for size, width in [('thumb', 200), ('card', 480), ('detail', 960)]:
+            for fmt in ['webp', 'jpeg']:
+                with default_storage.open(derivative_name(product.image.name, size, fmt)) as f:
+                    self.assertEqual(Image.open(f).width, width)
+        self.assertTrue(product.image_variants.card.endswith('__card.jpeg'))
+
+    def test_srcset_tag(self):
+        product = Product.objects.create(name='Cake', slug='cake', category=self.category,
+                                         description='', price=500, image=self.upload())
+        rendered = Template("{% load shop_images %}{% srcset product.image 'webp' %}").render(
+            Context({'product': product}))
+        self.assertIn('__thumb.webp 200w', rendered)
+        self.assertIn('__detail.webp 960w', rendered)
+
+    def test_srcset_lists_the_widths_produced(self):
+        product = Product.objects.create(name='Cake', slug='cake', category=self.category,
+                                         description='', price=500, image=self.upload(size=(300, 300)))
+        thumb, card = (product.image_variants.url(size) for size in ['thumb', 'card'])
+        self.assertEqual(product.image_variants.srcset(), f'{thumb} 200w, {card} 300w')
+        # Another process only has the files to go by
+        images._widths.clear()
+        self.assertEqual(product.image_variants.srcset(), f'{thumb} 200w, {card} 300w')
+
+    def test_missing_derivatives_fall_back_to_original(self):
+        review = Review(image='reviews/old.jpg')
+        self.assertEqual(review.image_variants.srcset(), review.image.url)
+        self.assertEqual(review.image_variants.srcset('webp'), '')
+
+    def test_missing_derivatives_check_is_cached(self):
+        with mock.patch.object(default_storage, 'exists', return_value=False) as exists:
+            for _ in range(3):
+                self.assertEqual(Review(image='reviews/old.jpg').image_variants.card, '/media/reviews/old.jpg')
+        self.assertEqual(exists.call_count, 1)
+
+    def test_customer_uploads_are_not_resized_inline(self):
+        feedback = Feedback.objects.create(name='A', email='a@example.com', message='Lovely', rating=5, photo=self.upload())
+        self.assertFalse(default_storage.exists(derivative_name(feedback.photo.name, 'card', 'jpeg')))
+        feedback.is_approved = True
+        feedback.save()
+        self.assertTrue(default_storage.exists(derivative_name(feedback.photo.name, 'card', 'jpeg')))
+
+    def test_approve_action_creates_derivatives(self):
+        feedback = Feedback.objects.create(name='A', email='a@example.com', message='Lovely', rating=5, photo=self.upload())
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        self.client.post(reverse('admin:shop_feedback_changelist'),
+                         {'action': 'approve_feedback', '_selected_action': [feedback.pk]})
+        self.assertTrue(Feedback.objects.get().is_approved)
+        self.assertTrue(default_storage.exists(derivative_name(feedback.photo.name, 'card', 'jpeg')))
+
+    def test_decompression_bomb_keeps_original(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs('shop.signals', 'WARNING'):
+            product = Product.objects.create(name='Cake', slug='cake', category=self.category,
+                                             description='', price=500, image=self.upload())
+        self.assertEqual(product.image_variants.card, product.image.url)
+
+    def test_backfill_command(self):
+        default_storage.save('reviews/old.jpg', self.upload('old.jpg', (300, 300)))
+        Review.objects.bulk_create([Review(image='reviews/old.jpg')])  # skips post_save
+        call_command('generate_image_derivatives', workers=1, stdout=StringIO())
+        self.assertTrue(default_storage.exists('reviews/old__thumb.webp'))
+        # Small originals are not upscaled
+        with default_storage.open('reviews/old__detail.jpeg') as f:
+            self.assertEqual(Image.open(f).width, 300)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = make_products(3)
+        get_flavor_menu()
+
+    def test_guest_page_served_from_cache(self):
+        first = self.client.get(reverse('shop:shop'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('shop:shop'))
+        self.assertEqual(first.content, second.content)
+        self.assertIn('Cookie', second['Vary'])
+        self.assertEqual(get_cache_stats()['page'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_catalog_edit_invalidates_pages(self):
+        self.client.get(reverse('shop:category_detail', args=['cakes']))
+        self.products[0].name = 'Renamed Cake'
+        self.products[0].save()
+        response = self.client.get(reverse('shop:category_detail', args=['cakes']))
+        self.assertContains(response, 'Renamed Cake')
+
+    def test_cart_size_is_part_of_the_key(self):
+        self.client.get(reverse('shop:offers'))
+        self.client.post(reverse('shop:add_to_cart', args=[self.products[0].slug]))
+        response = self.client.get(reverse('shop:offers'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'items in cart')
+
+    def test_logged_in_pages_not_cached(self):
+        User.objects.create_user('amina', password='pw')
+        self.client.login(username='amina', password='pw')
+        self.client.get(reverse('shop:recipe'))
+        self.assertIsNotNone(self.client.get(reverse('shop:recipe')).context)
+
+    def test_csrf_pages_use_data_cache_only(self):
+        url = reverse('shop:product_detail', args=[self.products[0].slug])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertEqual(get_cache_stats()['product']['hits'], 1)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('shop:cache_stats')).status_code, 302)
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        response = self.client.get(reverse('shop:cache_stats'))
+        self.assertIn('page', response.json()['caches'])
+
+
+@override_settings(CATALOG_READ_ALIAS='replica')
+class ReplicaRouterTests(SimpleTestCase):
+    def test_catalog_reads_go_to_replica(self):
+        self.assertEqual(router.db_for_read(Product), 'replica')
+        self.assertEqual(router.db_for_read(Product.flavors.through), 'replica')
+        self.assertEqual(router.db_for_read(Order), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'shop', model_name='product'))
+
+    @override_settings(CATALOG_READ_ALIAS=None)
+    def test_without_replica_everything_stays_on_primary(self):
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+
+@override_settings(CATALOG_READ_ALIAS='replica')
+class ReplicaRouterTransactionTests(TestCase):
+    def test_reads_inside_a_transaction_stay_on_primary(self):
+        # TestCase wraps every test in a transaction, like checkout's select_for_update
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite tuning")
+@override_settings(SQLITE_PRAGMAS={'busy_timeout': 5000, 'synchronous': 'NORMAL'}, SQLITE_TRANSACTION_MODE='IMMEDIATE')
+class SQLiteTuningTests(TransactionTestCase):
+    def test_pragmas_applied_on_connect(self):
+        # A new connection: closing the in-memory test database's one is a no-op
+        fresh = connections.create_connection('default')
+        try:
+            with fresh.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        finally:
+            fresh.close()
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Flavor.objects.create(name='Mango')
+        self.assertEqual(ctx.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+@override_settings(PERF_METRICS=True, PERF_SERVER_TIMING=True)
+class PerformanceMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        make_products(3)
+
+    def test_request_is_timed(self):
+        response = self.client.get(reverse('shop:shop'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+        view = registry.snapshot()['views']['shop:shop']
+        self.assertEqual(view['requests'], 1)
+        self.assertGreater(view['queries'], 0)
+        self.assertGreater(view['template_seconds'], 0)
+        self.assertEqual(view['cache_misses'], 3)  # page, categories, listing
+
+    def test_staff_endpoint_formats(self):
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        self.client.get(reverse('shop:offers'))
+        self.assertIn('shop:offers', self.client.get(reverse('shop:metrics')).json()['views'])
+        text = self.client.get(reverse('shop:metrics'), {'format': 'prometheus'}).content.decode()
+        self.assertIn('shop_request_duration_seconds_bucket{view="shop:offers",le="+Inf"} 1', text)
+
+    @override_settings(PERF_METRICS=False)
+    def test_disabled_middleware_is_skipped(self):
+        response = self.client.get(reverse('shop:shop'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot()['views'], {})
+
+
+class QueryBudgetTests(TestCase):
+    """Query and render-time ceilings for every storefront URL, measured with cold caches.
+
+    Raising a budget should be a conscious decision in review: a count that
+    grows with the catalog is an N+1.
+    """
+
+    RENDER_BUDGET = 0.5  # seconds, generous enough for a slow CI box
+    BUDGETS = {
+        'shop:home': {'get': 7},
+        'shop:shop': {'plain': 5, 'search': 6, 'category': 5, 'flavor': 5, 'price': 5,
+                      'sort': 5, 'next_page': 5, 'everything': 6},
+        'shop:category_detail': {'get': 4},
+        'shop:product_detail': {'get': 4},
+        'shop:cart': {'one_item': 3, 'fifty_items': 3},
+        'shop:add_to_cart': {'post': 5},
+        'shop:add_to_cart_batch': {'post': 5},
+        'shop:delivery_dates': {'get': 1},
+        'shop:update_cart': {'post': 4},
+        'shop:remove_from_cart': {'get': 4},
+        'shop:checkout': {'get': 3, 'post': 14},
+        'shop:order_success': {'get': 3},
+        'shop:custom_cake': {'get': 1},
+        'shop:offers': {'get': 3},
+        'shop:gift_boxes': {'get': 1},
+        'shop:recipe': {'get': 1},
+        'shop:location': {'get': 1},
+        'shop:contact': {'get': 1},
+        'shop:cache_stats': {'get': 2},
+        'shop:metrics': {'get': 2},
+        'shop:production_plan': {'get': 5},
+        'accounts:login': {'get': 1},
+        'accounts:register': {'get': 1},
+        'accounts:logout': {'post': 4},
+        'accounts:profile': {'get': 6},
+        'accounts:reorder': {'post': 7},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = Category.objects.bulk_create([
+            Category(name=f'Category {i}', slug=f'category-{i}') for i in range(8)
+        ])
+        cls.flavors = Flavor.objects.bulk_create([Flavor(name=f'Flavor {i}') for i in range(20)])
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Cake {i}', slug=f'cake-{i}', category=cls.categories[i % 8],
+                    description=f'Layered cake number {i}', price=Decimal(300 + i),
+                    featured=i % 10 == 0, image='products/test.jpg')
+            for i in range(300)
+        ])
+        Product.flavors.through.objects.bulk_create([
+            Product.flavors.through(product=product, flavor=cls.flavors[(i + k) % 20])
+            for i, product in enumerate(cls.products) for k in range(3)
+        ])
+        get_search_backend().rebuild()
+        Review.objects.bulk_create([Review(image=f'reviews/{i}.jpg') for i in range(60)])
+        FAQ.objects.bulk_create([FAQ(question=f'Q{i}?', answer='Yes', is_answered=True) for i in range(30)])
+        Feedback.objects.bulk_create([
+            Feedback(name=f'Guest {i}', email='g@example.com', message='Lovely', rating=5, is_approved=True)
+            for i in range(30)
+        ])
+        cls.user = User.objects.create_user('01700000000', password='pw', is_staff=True)
+        orders = Order.objects.bulk_create([
+            Order(user=cls.user, name='Guest', phone='01700000000', delivery_method='pickup',
+                  delivery_date=date.today() + timedelta(days=1), total=Decimal('900'))
+            for _ in range(30)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=cls.products[i * 3 + k], price=Decimal('300'), quantity=1)
+            for i, order in enumerate(orders) for k in range(3)
+        ])
+        cls.order = orders[0]
+        # What the daily sync_delivery_capacity run leaves behind
+        sync_capacity(date.today(), date.today() + timedelta(days=59))
+
+    def request(self, name, case, method, url, data=None, **extra):
+        cache.clear()
+        invalidate_flavor_menu()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data, **extra)
+            elapsed = time.perf_counter() - start
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(
+            len(ctx.captured_queries), self.BUDGETS[name][case],
+            f"{name} ({case}) ran more queries than budgeted:\n"
+            + '\n'.join(query['sql'] for query in ctx.captured_queries),
+        )
+        self.assertLess(elapsed, self.RENDER_BUDGET, f"{name} ({case}) took {elapsed:.3f}s")
+        return response
+
+    def fill_cart(self, count):
+        self.client.post(reverse('shop:add_to_cart_batch'), json.dumps({
+            'items': [{'slug': product.slug, 'quantity': 1} for product in self.products[:count]],
+        }), content_type='application/json')
+
+    def login(self):
+        self.client.login(username='01700000000', password='pw')
+
+    def test_every_url_has_a_budget(self):
+        names = set()
+        for namespace in ['shop', 'accounts']:
+            patterns = get_resolver().namespace_dict[namespace][1].url_patterns
+            names |= {f'{namespace}:{pattern.name}' for pattern in patterns}
+        self.assertEqual(names, set(self.BUDGETS))
+
+    def test_home(self):
+        self.request('shop:home', 'get', 'get', reverse('shop:home'))
+
+    def test_shop_filters(self):
+        url = reverse('shop:shop')
+        cases = {
+            'plain': {},
+            'search': {'q': 'layered cake'},
+            'category': {'category': 'category-3'},
+            'flavor': {'flavor': self.flavors[4].id},
+            'price': {'min_price': 350, 'max_price': 500},
+            'sort': {'sort': '-price'},
+            'everything': {'q': 'cake', 'category': 'category-3', 'flavor': self.flavors[4].id,
+                           'min_price': 300, 'max_price': 550, 'sort': 'price'},
+        }
+        for case, params in cases.items():
+            with self.subTest(case):
+                self.request('shop:shop', case, 'get', url, params)
+        cursor = self.client.get(url).context['products'].next_cursor
+        self.request('shop:shop', 'next_page', 'get', url, {'cursor': cursor})
+
+    def test_catalog_pages(self):
+        self.request('shop:category_detail', 'get', 'get', reverse('shop:category_detail', args=['category-2']))
+        self.request('shop:product_detail', 'get', 'get', reverse('shop:product_detail', args=['cake-42']))
+        for name in ['shop:offers', 'shop:gift_boxes', 'shop:recipe', 'shop:location', 'shop:contact',
+                     'shop:custom_cake', 'accounts:login', 'accounts:register']:
+            self.request(name, 'get', 'get', reverse(name))
+
+    def test_cart_pages(self):
+        self.fill_cart(1)
+        self.request('shop:cart', 'one_item', 'get', reverse('shop:cart'))
+        self.fill_cart(50)
+        self.request('shop:cart', 'fifty_items', 'get', reverse('shop:cart'))
+
+    def test_cart_mutations(self):
+        slug = self.products[7].slug
+        self.request('shop:add_to_cart', 'post', 'post', reverse('shop:add_to_cart', args=[slug]), {'quantity': 2})
+        self.request('shop:add_to_cart_batch', 'post', 'post', reverse('shop:add_to_cart_batch'),
+                     json.dumps({'items': [{'slug': p.slug, 'quantity': 1} for p in self.products[:20]]}),
+                     content_type='application/json')
+        self.request('shop:update_cart', 'post', 'post', reverse('shop:update_cart', args=[slug]), {'quantity': 5})
+        self.request('shop:remove_from_cart', 'get', 'get', reverse('shop:remove_from_cart', args=[slug]))
+        self.request('shop:delivery_dates', 'get', 'get', reverse('shop:delivery_dates'), {'count': 14})
+
+    def test_checkout(self):
+        self.fill_cart(10)
+        self.request('shop:checkout', 'get', 'get', reverse('shop:checkout'))
+        response = self.request('shop:checkout', 'post', 'post', reverse('shop:checkout'), {
+            'name': 'Guest', 'phone': '01711111111', 'delivery_method': 'pickup',
+            'delivery_date': (date.today() + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.request('shop:order_success', 'get', 'get', response['Location'])
+
+    def test_account_pages(self):
+        self.login()
+        self.request('accounts:profile', 'get', 'get', reverse('accounts:profile'))
+        self.request('accounts:reorder', 'post', 'post', reverse('accounts:reorder', args=[self.order.id]))
+        self.request('shop:cache_stats', 'get', 'get', reverse('shop:cache_stats'))
+        self.request('shop:metrics', 'get', 'get', reverse('shop:metrics'))
+        self.request('shop:production_plan', 'get', 'get', reverse('shop:production_plan'))
+        self.request('accounts:logout', 'post', 'post', reverse('accounts:logout'))
+
+
+class LoadTestSummaryTests(SimpleTestCase):
+    def test_percentiles_errors_and_queries(self):
+        results = [('shop', i / 1000, 200, 5) for i in range(1, 101)]
+        results += [('place_order', 0.2, 302, None), ('place_order', 0.4, 403, None)]
+        summary = summarize(results, elapsed=2.0)
+        self.assertEqual(summary['total']['rps'], 51.0)
+        self.assertEqual(summary['total']['errors'], 1)
+        shop = summary['steps']['shop']
+        self.assertEqual((shop['p50_ms'], shop['p95_ms'], shop['p99_ms']), (51.0, 96.0, 100.0))
+        self.assertEqual(shop['queries_per_request'], 5)
+        self.assertIsNone(summary['steps']['place_order']['queries_per_request'])
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.products = make_products(3)
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:shop_order_changelist')
+
+    def make_orders(self, count, phone='01711111111'):
+        orders = Order.objects.bulk_create([
+            Order(user=self.admin, name='Guest', phone=phone, delivery_method='pickup',
+                  delivery_date=date.today() + timedelta(days=1), total=Decimal('0'))
+            for _ in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=Decimal('100'), quantity=2)
+            for order in orders for product in self.products
+        ])
+        return orders
+
+    def count_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return ctx.captured_queries, response
+
+    def test_changelist_query_count_is_constant(self):
+        self.make_orders(3)
+        few, _ = self.count_queries()
+        self.make_orders(30)
+        many, response = self.count_queries()
+        self.assertEqual(len(few), len(many))
+        order = response.context['cl'].result_list[0]
+        self.assertEqual((order.item_count, order.revenue), (6, Decimal('600')))
+        # Count and date hierarchy stay on the orders table alone
+        self.assertFalse([q for q in many if 'COUNT' in q['sql'] and 'shop_orderitem' in q['sql']])
+
+    def test_numeric_search_is_exact(self):
+        target = self.make_orders(1, phone='01799999999')[0]
+        self.make_orders(2)
+        for term, expected in [(str(target.id), [target.id]), (f'#{target.id}', [target.id]),
+                               ('01799999999', [target.id]), ('01799-999999', [target.id])]:
+            queries, response = self.count_queries({'q': term})
+            self.assertEqual([o.id for o in response.context['cl'].result_list], expected, term)
+            self.assertFalse([q for q in queries if 'LIKE' in q['sql'] and 'shop_order' in q['sql']])
+
+    def test_formatted_and_partial_phone_search(self):
+        local = self.make_orders(1, phone='01712345678')[0]
+        international = self.make_orders(1, phone='+8801712345678')[0]
+        self.make_orders(2)
+        for term, expected in [('+8801712345678', [international.id]), ('01712-345678', [local.id]),
+                               ('017123', [local.id]), ('+880 1712', [international.id]), ('0179', [])]:
+            _, response = self.count_queries({'q': term})
+            self.assertEqual([o.id for o in response.context['cl'].result_list], expected, term)
+
+    def test_change_page_product_is_editable_without_loading_catalog(self):
+        order = self.make_orders(1)[0]
+        url = reverse('admin:shop_order_change', args=[order.id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT') and
+                          'FROM "shop_product"' in q['sql'] and 'WHERE' not in q['sql']])
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.products = make_products(3)
+        self.tomorrow = date.today() + timedelta(days=1)
+
+    def place(self, quantities, method='pickup', day=None):
+        order = Order(name='Test', phone='017', delivery_method=method, delivery_date=day or self.tomorrow)
+        return place_order(order, {self.products[i].slug: qty for i, qty in quantities.items()})
+
+    def rollup(self):
+        return {
+            (row.date, row.product_id, row.delivery_method): (row.quantity, row.revenue, row.order_count)
+            for row in DailySales.objects.all()
+        }
+
+    def test_orders_are_added_to_rollup(self):
+        self.place({0: 2, 1: 1})
+        self.place({0: 3}, method='delivery')
+        self.place({0: 1})
+        self.assertEqual(self.rollup(), {
+            (self.tomorrow, self.products[0].id, 'pickup'): (3, Decimal('300.00'), 2),
+            (self.tomorrow, self.products[1].id, 'pickup'): (1, Decimal('101.00'), 1),
+            (self.tomorrow, self.products[0].id, 'delivery'): (3, Decimal('300.00'), 1),
+        })
+        [(day, lines)] = production_schedule()
+        self.assertEqual(day, self.tomorrow)
+        self.assertEqual(lines[0], {'product': 'Cake 0', 'pickup': 3, 'delivery': 3, 'total': 6})
+        trend = revenue_trend(end=self.tomorrow, days=2)
+        self.assertEqual([row['revenue'] for row in trend], [Decimal('0'), Decimal('701.00')])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.place({0: 2, 1: 1})
+        self.place({2: 4}, method='delivery', day=self.tomorrow + timedelta(days=40))
+        expected = self.rollup()
+        OrderItem.objects.filter(product=self.products[1]).delete()
+        DailySales.objects.create(date=date(2020, 1, 1), product=self.products[0], delivery_method='pickup', quantity=9)
+
+        out = StringIO()
+        call_command('rebuild_sales_rollup', '--days', '7', stdout=out)
+        del expected[(self.tomorrow, self.products[1].id, 'pickup')]
+        self.assertEqual(self.rollup(), expected)
+        self.assertIn('Rebuilt sales rollup with 2 rows', out.getvalue())
+
+    def test_migration_backfill_walks_windows(self):
+        migration = importlib.import_module('shop.migrations.0017_backfill_daily_sales')
+        self.place({0: 2, 1: 1})
+        self.place({2: 4}, method='delivery', day=self.tomorrow + timedelta(days=40))
+        expected = self.rollup()
+        DailySales.objects.all().delete()
+        with mock.patch.object(migration, 'WINDOW_DAYS', 7), \
+                mock.patch.object(DailySales.objects, 'bulk_create', wraps=DailySales.objects.bulk_create) as bulk_create:
+            migration.backfill_daily_sales(django_apps, None)
+        self.assertEqual(self.rollup(), expected)
+        self.assertEqual(bulk_create.call_count, 6)  # 41 days in 7-day windows
+
+    def test_admin_edits_and_deletes_keep_rollup_in_line(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        order = self.place({0: 2, 1: 1}).order
+        url = reverse('admin:shop_order_change', args=[order.pk])
+        formset = self.client.get(url).context['inline_admin_formsets'][0].formset
+        later = self.tomorrow + timedelta(days=2)
+        data = {
+            'name': order.name, 'phone': order.phone, 'address': '', 'note': '', 'user': '',
+            'delivery_method': 'pickup', 'delivery_date': later.isoformat(),
+            f'{formset.prefix}-TOTAL_FORMS': 2, f'{formset.prefix}-INITIAL_FORMS': 2,
+        }
+        for i, form in enumerate(formset.forms):
+            item = form.instance
+            data.update({
+                f'{formset.prefix}-{i}-id': item.pk, f'{formset.prefix}-{i}-order': order.pk,
+                f'{formset.prefix}-{i}-product': item.product_id,
+                f'{formset.prefix}-{i}-quantity': 5 if item.product_id == self.products[0].id else item.quantity,
+            })
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(self.rollup(), {
+            (later, self.products[0].id, 'pickup'): (5, Decimal('500.00'), 1),
+            (later, self.products[1].id, 'pickup'): (1, Decimal('101.00'), 1),
+        })
+
+        self.client.post(reverse('admin:shop_order_changelist'),
+                         {'action': 'delete_selected', '_selected_action': [order.pk], 'post': 'yes'})
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.rollup(), {})
+
+    def test_dashboard_query_count_is_constant(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        url = reverse('admin:shop_dailysales_changelist')
+        self.place({0: 1})
+        with CaptureQueriesContext(connection) as few:
+            self.assertContains(self.client.get(url), 'Cake 0')
+        for offset in range(20):
+            self.place({0: 1, 1: 2, 2: 3}, day=self.tomorrow + timedelta(days=offset % 5))
+        with CaptureQueriesContext(connection) as many:
+            self.assertContains(self.client.get(url), 'Cake 2')
+        self.assertEqual(len(few), len(many))
+
+
+class ProductionPlanTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2, weight='1 lbs')
+        self.day = date.today() + timedelta(days=2)
+        CustomCakeRequest.objects.bulk_create([
+            CustomCakeRequest(name='Guest', phone='017', email='g@example.com', flavor=flavor,
+                              weight='2 lbs', message='Happy birthday', delivery_date=self.day)
+            for flavor in ['Vanilla', 'Vanilla', 'Mango']
+        ])
+        for quantities in [{0: 2, 1: 1}, {0: 3}]:
+            place_order(Order(name='Test', phone='017', delivery_method='pickup', delivery_date=self.day),
+                        {self.products[i].slug: qty for i, qty in quantities.items()})
+
+    def test_bake_list_is_grouped_in_sql(self):
+        with self.assertNumQueries(2):
+            rows = bake_list(self.day, self.day)
+        self.assertEqual([(row['item'], row['flavor'], row['weight'], row['quantity']) for row in rows], [
+            ('Cake 0', '', '1 lbs', 5),
+            ('Cake 1', '', '1 lbs', 1),
+            ('Custom cake', 'Mango', '2 lbs', 1),
+            ('Custom cake', 'Vanilla', '2 lbs', 2),
+        ])
+
+    def test_staff_view_and_exports(self):
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        url = reverse('shop:production_plan')
+        params = {'start': self.day.isoformat(), 'end': self.day.isoformat()}
+        self.assertContains(self.client.get(url, params), 'Vanilla')
+
+        response = self.client.get(url, {**params, 'format': 'csv'})
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], 'Date,Type,Item,Flavor,Weight,Quantity')
+        self.assertEqual(lines[1], f'{self.day.isoformat()},Order,Cake 0,,1 lbs,5')
+
+        response = self.client.get(url, {**params, 'format': 'pdf'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        self.assertTrue(response.content.endswith(b'%%EOF\n'))
+        self.assertIn(b'(Vanilla)', response.content)
+
+    @override_settings(DAILY_CAPACITY=20)
+    def test_view_shows_each_dates_own_capacity(self):
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        url = reverse('shop:production_plan')
+        params = {'start': self.day.isoformat(), 'end': self.day.isoformat()}
+        [day] = self.client.get(url, params).context['days']
+        self.assertEqual((day['capacity'], day['booked']), (20, 9))
+        DeliveryCapacity.objects.filter(date=self.day).update(capacity=0)
+        self.assertContains(self.client.get(url, params), 'date closed')
+        DeliveryCapacity.objects.filter(date=self.day).update(capacity=6)
+        response = self.client.get(url, params)
+        self.assertContains(response, 'of 6')
+        self.assertContains(response, 'over capacity')
+
+    def test_pdf_clips_long_cells(self):
+        CustomCakeRequest.objects.filter(flavor='Mango').update(flavor='Mango ' * 40)
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        response = self.client.get(reverse('shop:production_plan'), {
+            'start': self.day.isoformat(), 'end': self.day.isoformat(), 'format': 'pdf'})
+        self.assertIn(b'(Mango Mango Mang...)', response.content)
+
+    def test_counter_starts_from_existing_bookings(self):
+        # The first reservation created the row, counting the custom requests
+        self.assertEqual(DeliveryCapacity.objects.get(date=self.day).booked, 9)
+
+    @override_settings(DAILY_CAPACITY=10)
+    def test_available_dates_skip_full_and_closed_days(self):
+        DeliveryCapacity.objects.create(date=self.day + timedelta(days=1), capacity=0)
+        DeliveryCapacity.objects.create(date=self.day + timedelta(days=2), capacity=30, booked=12)
+        with self.assertNumQueries(1):
+            dates = available_dates(3, quantity=2, start=self.day)
+        self.assertEqual(dates, [self.day + timedelta(days=2), self.day + timedelta(days=3), self.day + timedelta(days=4)])
+        self.assertEqual(available_dates(1, quantity=1, start=self.day), [self.day])
+
+    @override_settings(DAILY_CAPACITY=10)
+    def test_full_dates_are_refused(self):
+        session = self.client.session
+        session['cart'] = {self.products[0].slug: 2}
+        session.save()
+        data = {'name': 'Test', 'phone': '017', 'delivery_method': 'pickup', 'delivery_date': self.day}
+        response = self.client.post(reverse('shop:checkout'), data)
+        self.assertContains(response, 'fully booked')
+        self.assertEqual(Order.objects.count(), 2)
+
+        response = self.client.post(reverse('shop:checkout'), {**data, 'delivery_date': self.day + timedelta(days=1)})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.count(), 3)
+
+        custom = {'name': 'Guest', 'phone': '017', 'email': 'g@example.com', 'flavor': 'Mango',
+                  'weight': '1 lbs', 'message': 'Hi', 'delivery_date': self.day}
+        # 9 booked + 1 takes the last slot
+        self.assertEqual(self.client.post(reverse('shop:custom_cake'), custom).status_code, 302)
+        self.assertContains(self.client.post(reverse('shop:custom_cake'), custom), 'fully booked')
+        self.assertEqual(CustomCakeRequest.objects.count(), 4)
+
+
+class CapacityReleaseTests(TestCase):
+    def setUp(self):
+        self.tomorrow = date.today() + timedelta(days=1)
+
+    def booked(self, day=None):
+        return DeliveryCapacity.objects.get(date=day or self.tomorrow).booked
+
+    def test_benchmark_cleanup_releases_capacity(self):
+        call_command('benchmark_orders', orders=5, items=3, stdout=StringIO())
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.booked(), 0)
+
+    def test_admin_deletes_release_capacity(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        product = make_products(1)[0]
+        orders = [place_order(Order(name='Test', phone='017', delivery_method='pickup', delivery_date=self.tomorrow),
+                              {product.slug: 2}).order for _ in range(3)]
+        custom = CustomCakeRequest.objects.create(name='Guest', phone='017', email='g@example.com', flavor='Mango',
+                                                  weight='1 lbs', message='Hi', delivery_date=self.tomorrow)
+        sync_capacity(self.tomorrow, self.tomorrow, recount=True)
+        self.assertEqual(self.booked(), 7)
+
+        self.client.post(reverse('admin:shop_order_delete', args=[orders[0].pk]), {'post': 'yes'})
+        self.assertEqual(self.booked(), 5)
+        self.client.post(reverse('admin:shop_order_changelist'),
+                         {'action': 'delete_selected', '_selected_action': [orders[1].pk], 'post': 'yes'})
+        self.assertEqual(self.booked(), 3)
+        self.client.post(reverse('admin:shop_customcakerequest_delete', args=[custom.pk]), {'post': 'yes'})
+        self.assertEqual(self.booked(), 2)
+
+    def test_admin_added_request_books_capacity(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        sync_capacity(self.tomorrow, self.tomorrow)
+        self.client.post(reverse('admin:shop_customcakerequest_add'), {
+            'name': 'Walk-in', 'phone': '017', 'email': 'w@example.com', 'flavor': 'Mango',
+            'weight': '1 lbs', 'message': 'Phoned in', 'delivery_date': self.tomorrow.isoformat(),
+        })
+        self.assertEqual(CustomCakeRequest.objects.count(), 1)
+        self.assertEqual(self.booked(), 1)
+
+
+@override_settings(SQLITE_PRAGMAS={'busy_timeout': 5000}, SQLITE_TRANSACTION_MODE='IMMEDIATE')
+class CapacityRaceTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Concurrent writers need a file database: unset SQLITE_TEST_NAME")
+
+    def test_threads_racing_for_the_last_slots_never_oversell(self):
+        product = make_products(1)[0]
+        day = date.today() + timedelta(days=3)
+        DeliveryCapacity.objects.create(date=day, capacity=5, booked=3)
+        threads, barrier = 12, threading.Barrier(12)
+        results = []
+
+        def shopper():
+            try:
+                barrier.wait()
+                place_order(Order(name='Race', phone='017', delivery_method='pickup', delivery_date=day),
+                            {product.slug: 1})
+                results.append('booked')
+            except ValidationError:
+                results.append('refused')
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=shopper) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(results), ['booked'] * 2 + ['refused'] * 10)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(DeliveryCapacity.objects.get(date=day).booked, 5)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2)
+        self.orders = Order.objects.bulk_create([
+            Order(name=f'Guest {i}', phone='017', delivery_method='pickup', total=Decimal('300'),
+                  delivery_date=date(2026, 2, 10 + i))
+            for i in range(3)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=Decimal('100'), quantity=i + 1)
+            for order in self.orders for i, product in enumerate(self.products)
+        ])
+        CustomCakeRequest.objects.create(name='Guest', phone='017', email='g@example.com', flavor='Mango',
+                                         weight='1 lbs', message='Hi', delivery_date=date(2026, 2, 14))
+
+    def test_command_jsonl_with_delivery_filter(self):
+        out = StringIO()
+        call_command('export_orders', '--format', 'jsonl', '--delivery-from', '2026-02-11', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['name'] for record in records], ['Guest 1', 'Guest 2'])
+        self.assertEqual(records[0]['items'], [
+            {'product': 'Cake 0', 'quantity': 1, 'price': '100.00'},
+            {'product': 'Cake 1', 'quantity': 2, 'price': '100.00'},
+        ])
+
+    def test_admin_actions_stream(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post(reverse('admin:shop_order_changelist'), {
+            'action': 'export_csv', '_selected_action': [self.orders[0].pk, self.orders[2].pk],
+        })
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'order_id,created,delivery_date,delivery_method,name,phone,address,note,total,paid,product,quantity,price')
+        self.assertEqual([line.split(',')[4] for line in lines[1:]], ['Guest 0', 'Guest 0', 'Guest 2', 'Guest 2'])
+
+        response = self.client.post(reverse('admin:shop_customcakerequest_changelist'), {
+            'action': 'export_jsonl', '_selected_action': CustomCakeRequest.objects.values_list('pk', flat=True),
+        })
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['flavor'], 'Mango')
+
+
+@skipUnless(os.path.exists('/proc/self/statm'), "Reads resident memory from /proc")
+class ExportMemoryTests(TestCase):
+    ORDERS = 200_000
+    CEILING = 40 * 1024 * 1024  # bytes of resident memory the export may add
+
+    def resident(self):
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def test_export_memory_does_not_grow_with_orders(self):
+        product = make_products(1)[0]
+        with connection.cursor() as cursor:
+            # bulk_create would take longer than the export itself
+            cursor.execute(
+                "INSERT INTO shop_order (name, phone, address, delivery_method, delivery_date, note, total, created, paid) "
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s) "
+                "SELECT 'Guest', '017', '', 'pickup', %s, '', 200, %s, %s FROM n",
+                [self.ORDERS, date(2026, 1, 1), timezone.now(), False],
+            )
+            cursor.execute(
+                "INSERT INTO shop_orderitem (order_id, product_id, price, quantity) SELECT id, %s, 100, 2 FROM shop_order",
+                [product.pk],
+            )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post(reverse('admin:shop_order_changelist'), {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': Order.objects.values_list('pk', flat=True)[:1],
+        })
+
+        baseline = peak = self.resident()
+        rows = 0
+        for rows, _ in enumerate(response.streaming_content):
+            if rows % CHUNK_SIZE == 0:
+                peak = max(peak, self.resident())
+        self.assertEqual(rows, self.ORDERS)  # header + one line per order, counted from 0
+        self.assertLess(peak - baseline, self.CEILING)
+
+
+class ImportCatalogTests(TestCase):
+    HEADER = 'slug,name,price,category,category_name,flavors,featured,image\n'
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        override = self.settings(MEDIA_ROOT=os.path.join(self.tmp, 'media'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.images = os.path.join(self.tmp, 'images')
+        os.mkdir(self.images)
+        Image.new('RGB', (600, 400), 'brown').save(os.path.join(self.images, 'choc.jpg'), 'JPEG')
+        Flavor.objects.create(name='Chocolate')
+
+    def write(self, text, name='catalog.csv'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_import(self, text, *args, name='catalog.csv'):
+        out = StringIO()
+        call_command('import_catalog', self.write(text, name), *args, stdout=out)
+        return out.getvalue()
+
+    def test_creates_and_updates_by_slug(self):
+        self.run_import(self.HEADER
+                        + 'choc,Chocolate Truffle,550,cakes,Cakes,Chocolate|Hazelnut,yes,choc.jpg\n'
+                        + 'vanilla,Vanilla Dream,450,cakes,,Vanilla,no,\n', '--images', self.images)
+        choc = Product.objects.get(slug='choc')
+        self.assertEqual((choc.name, choc.price, choc.category.name, choc.featured), ('Chocolate Truffle', 550, 'Cakes', True))
+        self.assertEqual(sorted(choc.flavors.values_list('name', flat=True)), ['Chocolate', 'Hazelnut'])
+        self.assertEqual(choc.image.name, 'products/choc.jpg')
+        self.assertTrue(default_storage.exists(derivative_name(choc.image.name, 'card', 'webp')))
+        self.assertEqual([p.slug for p in search_products(Product.objects.all(), 'truffle')], ['choc'])
+
+        # Partial rows only touch the columns they carry; the image is kept
+        output = self.run_import('slug,price,flavors\nchoc,600,Chocolate\nvanilla,450,Vanilla\n')
+        self.assertIn('updated 1 products (1 unchanged)', output)
+        choc.refresh_from_db()
+        self.assertEqual((choc.price, choc.name, choc.image.name), (600, 'Chocolate Truffle', 'products/choc.jpg'))
+        self.assertEqual(list(choc.flavors.values_list('name', flat=True)), ['Chocolate'])
+
+    def test_changed_image_is_copied_under_a_new_name(self):
+        row = self.HEADER + 'choc,Chocolate Truffle,550,cakes,Cakes,Chocolate,yes,choc.jpg\n'
+        self.run_import(row, '--images', self.images)
+        self.assertIn('0 images copied', self.run_import(row, '--images', self.images))
+        self.assertEqual(Product.objects.get().image.name, 'products/choc.jpg')
+
+        Image.new('RGB', (600, 400), 'white').save(os.path.join(self.images, 'choc.jpg'), 'JPEG')
+        self.assertIn('1 images copied', self.run_import(row, '--images', self.images))
+        choc = Product.objects.get()
+        self.assertNotEqual(choc.image.name, 'products/choc.jpg')
+        with choc.image.open() as f:
+            self.assertEqual(Image.open(f).getpixel((0, 0)), (255, 255, 255))
+
+    def test_write_errors_are_not_reported_as_unreadable_input(self):
+        row = self.HEADER + 'choc,Chocolate Truffle,550,cakes,Cakes,Chocolate,yes,choc.jpg\n'
+        with mock.patch.object(default_storage, 'save', side_effect=OSError('disk full')), \
+                self.assertRaisesMessage(OSError, 'disk full'):
+            self.run_import(row, '--images', self.images)
+        with self.assertRaisesMessage(CommandError, 'Cannot read'):
+            self.run_import('[', name='catalog.json')
+
+    def test_json_dry_run_reports_without_writing(self):
+        make_products(1, image='')
+        path_rows = [
+            {'slug': 'cake-0', 'price': '150', 'flavors': ['Chocolate']},
+            {'slug': 'mango', 'name': 'Mango Mousse', 'price': 400, 'category': 'mousse', 'flavors': ['Mango']},
+        ]
+        output = self.run_import(json.dumps(path_rows), '--dry-run', name='catalog.json')
+        self.assertIn('+ category mousse', output)
+        self.assertIn('+ flavor Mango', output)
+        self.assertIn('+ product mango', output)
+        self.assertIn("~ product cake-0: price 100.00 -> 150.00, flavors [] -> ['Chocolate']", output)
+        self.assertEqual(Product.objects.get().price, Decimal('100.00'))
+        self.assertFalse(Flavor.objects.filter(name='Mango').exists())
+
+    def test_invalid_rows_abort_the_whole_import(self):
+        with self.assertRaisesMessage(CommandError, '2 problem(s)'):
+            self.run_import('slug,name,price,category\nok,Fine,100,cakes\nbad,Bad,cheap,cakes\nnew,,,\n')
+        self.assertFalse(Product.objects.exists())
+
+    def test_values_that_would_fail_on_write_are_caught_by_validation(self):
+        Category.objects.create(name='Birthday Cake', slug='birthday')
+        rows = ('slug,name,price,category,category_name,flavors\n'
+                'a,A,NaN,cakes,,\n'
+                'b,B,Infinity,cakes,,\n'
+                'c,B,123456789,cakes,,\n'
+                f'd,{"x" * 201},100,cakes,,\n'
+                f'e,E,100,cakes,,{"f" * 51}\n'
+                'f,F,100,cakes-dup,Birthday Cake,\n')
+        for args in [['--dry-run'], []]:
+            with self.assertRaisesMessage(CommandError, '6 problem(s)') as ctx:
+                self.run_import(rows, *args)
+        message = str(ctx.exception)
+        self.assertIn("line 2: invalid price 'NaN'", message)
+        self.assertIn('line 5: name: Ensure this value has at most 200 characters', message)
+        self.assertIn("line 7: category 'cakes-dup' cannot be named 'Birthday Cake', category 'birthday' already is", message)
+        self.assertFalse(Product.objects.exists())
+
+    def test_malformed_csv_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, 'malformed CSV'):
+            self.run_import(f'slug,name\nchoc,"{"x" * 200_000}"\n')
+
+    def test_queries_grow_per_batch_not_per_product(self):
+        rows = ''.join(f'cake-{i},Cake {i},100,cakes,,Chocolate,no,\n' for i in range(400))
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_import(self.HEADER + rows, '--batch-size', '1000')
+        # Only SQLite's 999-parameter limit splits the bulk inserts further
+        self.assertLess(len(ctx.captured_queries), 25)
+        self.assertEqual(Product.flavors.through.objects.count(), 400)
@@ -12,6 +12,8 @@ urlpatterns = [
     
     path('cart/', views.cart, name='cart'),
     path('add-to-cart/<slug:slug>/', views.add_to_cart, name='add_to_cart'),
+    path('api/cart/add/', views.add_to_cart_batch, name='add_to_cart_batch'),
+    path('api/delivery-dates/', views.delivery_dates, name='delivery_dates'),
     path('update-cart/<slug:slug>/', views.update_cart, name='update_cart'),
     path('remove-from-cart/<slug:slug>/', views.remove_from_cart, name='remove_from_cart'),
 
@@ -25,6 +27,10 @@ urlpatterns = [
     path('recipe/', views.recipe, name='recipe'),
     path('location/', views.location, name='location'),
     path('contact/', views.contact, name='contact'),
+
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('production/', views.production_plan, name='production_plan'),
    
 ]
 
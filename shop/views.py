@@ -2,14 +2,15 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages  # ← ADD THIS
 from .models import Product, Category, Review, FAQ , Feedback
 from .forms import FAQForm, FeedbackForm, CustomCakeForm
+from .cache import cache_page_for_guests, catalog_cached, get_flavor_menu, get_home_sections
+from .pagination import SORTS, InvalidCursor, KeysetPaginator
+from .search import search_products
 from django.utils import timezone
 
 def home(request):
-    featured_products = Product.objects.filter(featured=True, available=True)[:6]
-    categories = Category.objects.all()[:6]
-    reviews = Review.objects.all().order_by('-created')
+    sections = get_home_sections()
+    reviews = sections['reviews']
     slides = [reviews[i:i+4] for i in range(0, len(reviews), 4)]
-    faqs = FAQ.objects.filter(is_answered=True)
     faq_form = FAQForm()
     if request.method == 'POST' and 'faq_submit' in request.POST:
         faq_form = FAQForm(request.POST)
@@ -18,7 +19,6 @@ def home(request):
             messages.success(request, "Question submitted! We'll answer soon.")
             return redirect('shop:home')
         
-    feedbacks = Feedback.objects.filter(is_approved=True)[:6]  # Show 6 latest approved
     feedback_form = FeedbackForm()
 
     if request.method == 'POST' and 'feedback_submit' in request.POST:
@@ -31,12 +31,12 @@ def home(request):
         feedback_form = FeedbackForm()
             
     return render(request, 'shop/home.html', {
-        'featured_products': featured_products,
-        'categories': categories,
+        'featured_products': sections['featured'],
+        'categories': sections['categories'],
         'slides': slides,
-        'faqs': faqs,
+        'faqs': sections['faqs'],
         'faq_form': faq_form,
-        'feedbacks': feedbacks,
+        'feedbacks': sections['feedbacks'],  # 6 latest approved
         'feedback_form': feedback_form,
     })
     
@@ -53,21 +53,28 @@ def shop(request):
         'selected_category': category_filter
     })
 
+@cache_page_for_guests
 def category_detail(request, slug):
-    category = get_object_or_404(Category, slug=slug)
-    products = category.products.filter(available=True)
+    def load():
+        category = get_object_or_404(Category, slug=slug)
+        return category, list(category.products.available().for_listing())
+
+    category, products = catalog_cached('category', slug, load)
     return render(request, 'shop/category.html', {
         'category': category,
         'products': products
     })
 
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, available=True)
+    # Not page-cached: the add-to-cart form carries a CSRF token
+    product = catalog_cached('product', slug, lambda: get_object_or_404(
+        Product.objects.select_related('category').prefetch_related('flavors'),
+        slug=slug, available=True,
+    ))
     return render(request, 'shop/product_detail.html', {'product': product})
 
 # shop/views.py
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
 from .models import Product, Category, Flavor, Review
 
 def shop(request):
@@ -112,101 +119,122 @@ from django.contrib import messages
 # ... your existing views ...
 
 # shop/views.py
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
+from .cart import CART_MAX_QUANTITY, Cart
 
 def add_to_cart(request, slug):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request'})
 
     product = get_object_or_404(Product, slug=slug, available=True)
-    cart = request.session.get('cart', {})
-    
-    # Add or increase quantity
-    qty = int(request.POST.get('quantity', 1))
-    cart[slug] = cart.get(slug, 0) + qty
-    request.session['cart'] = cart
-    request.session.modified = True  # Important for session
+    cart = Cart(request)
 
-    # Calculate total items
-    total_items = sum(cart.values())
+    # Add or increase quantity
+    try:
+        cart.add(slug, int(request.POST.get('quantity', 1)))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Quantity must be a whole number of at least 1.'}, status=400)
 
     return JsonResponse({
         'success': True,
         'message': f"{product.name} added to cart!",
-        'cart_count': total_items
+        'cart_count': cart.item_count
     })
 
 def cart(request):
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total = 0
-    
-    for slug, quantity in cart.items():
-        product = get_object_or_404(Product, slug=slug)
-        subtotal = product.price * quantity
-        total += subtotal
-        cart_items.append({
-            'product': product,
-            'quantity': quantity,
-            'subtotal': subtotal
-        })
-    
+    cart = Cart(request)
+    cart_items = cart.items
+    if cart.pruned:
+        messages.warning(request, "Some items are no longer available and were removed from your cart.")
+
     return render(request, 'shop/cart.html', {
         'cart_items': cart_items,
-        'total': total
+        'total': cart.total
     })
 
 def update_cart(request, slug):
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        quantity = int(request.POST.get('quantity', 0))
-        
-        if quantity > 0:
-            cart[slug] = quantity
-        else:
-            cart.pop(slug, None)
-        
-        request.session['cart'] = cart
+        try:
+            quantity = int(request.POST.get('quantity', 0))
+        except ValueError:
+            messages.error(request, "Please enter a number.")
+            return redirect('shop:cart')
+        Cart(request).set(slug, quantity)
         messages.success(request, "Cart updated!")
-    
+
     return redirect('shop:cart')
 
 def remove_from_cart(request, slug):
-    cart = request.session.get('cart', {})
-    cart.pop(slug, None)
-    request.session['cart'] = cart
+    Cart(request).remove(slug)
     messages.success(request, "Item removed from cart.")
     return redirect('shop:cart')
 
+import json
+from django.views.decorators.http import require_POST
+
+CART_BATCH_MAX = 50
+
+def parse_cart_batch(body):
+    """``{"items": [{"slug": ..., "quantity": ...}, ...]}`` -> ``{slug: quantity}``."""
+    try:
+        entries = json.loads(body)['items']
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError("Expected a JSON object with an 'items' list.")
+    if not isinstance(entries, list) or not entries:
+        raise ValidationError("'items' must be a non-empty list.")
+    if len(entries) > CART_BATCH_MAX:
+        raise ValidationError(f"At most {CART_BATCH_MAX} items per request.")
+
+    quantities = {}
+    for entry in entries:
+        slug = entry.get('slug') if isinstance(entry, dict) else None
+        quantity = entry.get('quantity', 1) if isinstance(entry, dict) else None
+        if not isinstance(slug, str) or type(quantity) is not int or not 0 < quantity <= CART_MAX_QUANTITY:
+            raise ValidationError(
+                f"Each item needs a 'slug' and an integer 'quantity' from 1 to {CART_MAX_QUANTITY}.")
+        quantities[slug] = quantities.get(slug, 0) + quantity
+    return quantities
+
+@require_POST
+def add_to_cart_batch(request):
+    try:
+        quantities = parse_cart_batch(request.body)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': e.messages[0]}, status=400)
+
+    cart = Cart(request)
+    unavailable = cart.add_many(quantities)
+    return JsonResponse({
+        'success': len(unavailable) < len(quantities),
+        'unavailable': unavailable,
+        'cart_count': cart.item_count,
+        'cart': cart.summary(),
+    })
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
 from .forms import CheckoutForm
-from .models import Order, OrderItem, Product
+from .models import Order, Product
+from .orders import delivery_fee, place_order
 from django.contrib.auth import login
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
+from .mail import queue_mail
 
 
 def checkout(request):
-    cart = request.session.get('cart', {})
-    if not cart:
-        messages.error(request, "Your cart is empty.")
-        return redirect('shop:shop')
+    cart = Cart(request)
 
     # === CALCULATE CART ITEMS ===
-    cart_items = []
-    subtotal = 0
-    for slug, qty in cart.items():
-        product = get_object_or_404(Product, slug=slug)
-        item_total = product.price * qty
-        subtotal += item_total
-        cart_items.append({
-            'product': product,
-            'quantity': qty,
-            'subtotal': item_total
-        })
+    cart_items = cart.items
+    subtotal = cart.total
+    if not cart_items:
+        messages.error(request, "Your cart is empty.")
+        return redirect('shop:shop')
+    if cart.pruned:
+        messages.warning(request, "Some items are no longer available and were removed from your cart.")
 
     # === INITIAL FORM DATA ===
     initial_data = {'delivery_date': timezone.now().date()}
@@ -218,7 +246,7 @@ def checkout(request):
         })
 
     if request.method == 'POST':
-        form = CheckoutForm(request.POST)
+        form = CheckoutForm(request.POST, pieces=cart.item_count)
         create_account = request.POST.get('create_account')
 
         if form.is_valid():
@@ -232,10 +260,12 @@ def checkout(request):
                 if not order.name:
                     order.name = request.user.get_full_name() or request.user.username
 
-            # === DELIVERY FEE ===
-            delivery_fee = 100 if order.delivery_method == 'delivery' else 0
-            order.total = subtotal + delivery_fee
-            order.save()
+            # === SAVE ORDER + ITEMS (ATOMIC) ===
+            try:
+                placed = place_order(order, cart.data)
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('shop:cart')
 
             # === CREATE ACCOUNT IF GUEST WANTS ===
             if create_account and not request.user.is_authenticated:
@@ -248,20 +278,11 @@ def checkout(request):
                 login(request, user)
                 messages.info(request, f"Account created! Username: {phone}")
 
-            # === SAVE ORDER ITEMS ===
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['product'].price,
-                    quantity=item['quantity']
-                )
-
             # === ADMIN EMAIL (EMAIL FROM FORM) ===
             customer_email = form.cleaned_data.get('email', 'N/A')
             items_list = "\n".join([
-                f"- {item['quantity']} × {item['product'].name} (৳{item['subtotal']})"
-                for item in cart_items
+                f"- {item.quantity} × {item.product.name} (৳{item.price * item.quantity})"
+                for item in placed.items
             ])
 
             subject = f"New Order #{order.id} - {order.name}"
@@ -284,22 +305,21 @@ Notes: {order.note or 'None'}
 Admin: {request.build_absolute_uri('/admin/shop/order/' + str(order.id) + '/change/')}
 """
 
-            send_mail(
+            queue_mail(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
                 settings.ADMIN_EMAILS,
-                fail_silently=False,
             )
 
             # === CLEAR CART ===
-            request.session['cart'] = {}
+            cart.clear()
             messages.success(request, f"Order #{order.id} placed!")
             return redirect('shop:order_success', order_id=order.id)
     else:
         form = CheckoutForm(initial=initial_data)
 
-    total = subtotal + (100 if request.POST.get('delivery_method') == 'delivery' else 0)
+    total = subtotal + delivery_fee(request.POST.get('delivery_method'))
 
     context = {
         'form': form,
@@ -318,20 +338,12 @@ def order_success(request, order_id):
     return render(request, 'shop/order_success.html', {'order': order})
 
 from django.core.paginator import Paginator
-from django.core.mail import send_mail
 
+@cache_page_for_guests
 def shop(request):
-    products = Product.objects.filter(available=True)
-    categories = Category.objects.all()
-    flavors = Flavor.objects.all()
-
-    # SEARCH
-    query = request.GET.get('q')
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query)
-        )
+    products = Product.objects.available().for_listing()
+    categories = catalog_cached('shop', 'categories', lambda: list(Category.objects.all()))
+    flavors = get_flavor_menu()
 
     # FILTERS (existing)
     category_slug = request.GET.get('category')
@@ -342,19 +354,48 @@ def shop(request):
     if category_slug:
         products = products.filter(category__slug=category_slug)
     if flavor_id:
-        products = products.filter(flavors__id=flavor_id)
+        products = products.with_flavor(flavor_id)
     if min_price:
         products = products.filter(price__gte=min_price)
     if max_price:
         products = products.filter(price__lte=max_price)
 
+    # SEARCH: after the filters, so the capped ranking only covers matching products
+    query = request.GET.get('q')
+    if query:
+        products = search_products(products, query)
+
     # PAGINATION
-    paginator = Paginator(products, 9)  # 6 per page
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORTS else 'newest'
+    if query:
+        # Search results are rank-ordered and capped, so numbered pages stay cheap
+        paginator = Paginator(products, 9)
+        products = paginator.get_page(request.GET.get('page'))
+        total_count, count_is_estimate = paginator.count, False
+    else:
+        paginator = KeysetPaginator(products, 9, SORTS[sort], count_mode=settings.SHOP_COUNT_MODE)
+
+        def load_page():
+            try:
+                return paginator.page(request.GET.get('cursor'))
+            except InvalidCursor:
+                return paginator.page()
+
+        products = catalog_cached('shop', sorted(request.GET.lists()), load_page)
+        total_count, count_is_estimate = products.count, products.count_is_estimate
+
+    # Filters carried over into next/previous links
+    page_query = request.GET.copy()
+    for key in ('cursor', 'page'):
+        page_query.pop(key, None)
 
     context = {
         'products': products,
+        'cursor_pagination': not query,
+        'page_query': page_query.urlencode(),
+        'total_count': total_count,
+        'count_is_estimate': count_is_estimate,
+        'selected_sort': sort,
         'categories': categories,
         'flavors': flavors,
         'query': query,
@@ -367,7 +408,8 @@ def shop(request):
 
 # shop/views.py
 from .forms import CustomCakeForm
-from .models import CustomCakeRequest
+from django.db import transaction
+from .production import reserve
 
 def custom_cake(request):
     if request.method == 'POST':
@@ -385,7 +427,13 @@ def custom_cake(request):
                 if not custom.email:
                     custom.email = request.user.email
 
-            custom.save()
+            try:
+                with transaction.atomic():
+                    reserve(custom.delivery_date, 1)
+                    custom.save()
+            except ValidationError as e:
+                form.add_error('delivery_date', e)
+                return render(request, 'shop/custom_cake.html', {'form': form})
 
             # === ADMIN EMAIL ===
             subject = f"Custom Cake Request - {custom.name}"
@@ -408,12 +456,11 @@ Notes: {custom.note or 'None'}
 Admin: {request.build_absolute_uri('/admin/shop/customcakerequest/' + str(custom.id) + '/change/')}
 """
 
-            send_mail(
+            queue_mail(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
                 settings.ADMIN_EMAILS,
-                fail_silently=False,
             )
 
             messages.success(request, "Request sent! We'll contact you soon.")
@@ -430,17 +477,23 @@ Admin: {request.build_absolute_uri('/admin/shop/customcakerequest/' + str(custom
 
     return render(request, 'shop/custom_cake.html', {'form': form})
 
+@cache_page_for_guests
 def offers(request):
     # Show featured/discount products
-    products = Product.objects.filter(featured=True, available=True)
+    products = catalog_cached('offers', 'featured', lambda: list(
+        Product.objects.available().filter(featured=True).for_listing()
+    ))
     return render(request, 'shop/offers.html', {'products': products})
 
+@cache_page_for_guests
 def gift_boxes(request):
     return render(request, 'shop/gift_boxes.html')
 
+@cache_page_for_guests
 def recipe(request):
     return render(request, 'shop/recipe.html')
 
+@cache_page_for_guests
 def location(request):
     return render(request, 'shop/location.html')
 
@@ -450,7 +503,7 @@ def contact(request):
         name = request.POST.get('name')
         email = request.POST.get('email')
         message = request.POST.get('message')
-        send_mail(
+        queue_mail(
             f"Contact Form: {name}",
             f"From: {email}\n\n{message}",
             email,
@@ -461,4 +514,90 @@ def contact(request):
     return render(request, 'shop/contact.html')
 
 
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from .cache import get_cache_stats, get_catalog_version
+from .metrics import prometheus_text, registry
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({
+        'catalog_version': get_catalog_version(),
+        'caches': get_cache_stats(),
+    })
+
+@staff_member_required
+def metrics(request):
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4')
+    return JsonResponse(registry.snapshot())
+
+
+# === PRODUCTION PLANNER ===
+import csv
+from datetime import date, timedelta
+from .pdf import table_pdf
+from .production import available_dates, bake_list, day_capacities
+
+PLAN_MAX_DAYS = 62
+
+
+def _plan_range(request):
+    today = timezone.localdate()
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else today
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else start + timedelta(days=6)
+    except ValueError:
+        start, end = today, today + timedelta(days=6)
+    if end < start:
+        end = start
+    return start, min(end, start + timedelta(days=PLAN_MAX_DAYS - 1))
+
+
+@staff_member_required
+def production_plan(request):
+    start, end = _plan_range(request)
+    rows = bake_list(start, end)
+    header = ['Date', 'Type', 'Item', 'Flavor', 'Weight', 'Quantity']
+    table = [[row['date'].isoformat(), row['kind'], row['item'], row['flavor'], row['weight'], row['quantity']]
+             for row in rows]
+    filename = f'bake-list-{start}-{end}'
+
+    export = request.GET.get('format')
+    if export == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(header)
+        writer.writerows(table)
+        return response
+    if export == 'pdf':
+        pdf = table_pdf(f'Bake list {start:%d %b} - {end:%d %b %Y}', header, table, [70, 50, 170, 110, 70, 50])
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+        return response
+
+    capacities = day_capacities(start, end)
+    days = []
+    for row in rows:
+        if not days or days[-1]['date'] != row['date']:
+            capacity, booked = capacities[row['date']]
+            days.append({'date': row['date'], 'rows': [], 'total': 0, 'capacity': capacity, 'booked': booked})
+        days[-1]['rows'].append(row)
+        days[-1]['total'] += row['quantity']
+    return render(request, 'shop/production.html', {
+        'title': 'Bake list', 'start': start, 'end': end, 'days': days,
+    })
+
+
+DELIVERY_DATES_MAX = 30
+
 
+def delivery_dates(request):
+    """JSON list of the next bookable delivery dates for ``quantity`` cakes."""
+    try:
+        count = min(max(int(request.GET.get('count', 7)), 1), DELIVERY_DATES_MAX)
+        quantity = max(int(request.GET.get('quantity', 1)), 1)
+    except ValueError:
+        return JsonResponse({'error': "'count' and 'quantity' must be integers."}, status=400)
+    return JsonResponse({'dates': [day.isoformat() for day in available_dates(count, quantity)]})